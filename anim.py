@@ -0,0 +1,110 @@
+"""
+THE 77 - Cell animations
+Every running cell animation of a board advanced by one Clock callback
+"""
+
+import math
+from array import array
+from kivy.clock import Clock
+
+NONE, FLIP, FLASH, PULSE = range(4)
+# Seconds per kind
+DURATION = (0.0, 0.18, 0.28, 0.3)
+# Extra delay for each further PULSE started in the same frame, so a
+# solved checkpoint ripples in tap order; later ones share the last delay
+STAGGER = 0.03
+MAX_STAGGER = 10
+
+class CellAnimator:
+    """Color and scale animations for the cells of one board.
+
+    Per-cell state is packed: ``kind`` (bytearray), start time and the
+    source and target colors (8 floats per cell), so starting, replacing
+    or stepping an animation allocates nothing. A single Clock interval
+    runs while any cell animates and hands each active cell to
+    ``draw(idx, rgba, scale_x, scale_y, front)``; ``front`` is False
+    during the first half of a FLIP, while the old face shows.
+
+    FLIP turns the cell over, swapping color and face at the midpoint.
+    FLASH pops the cell and fades it from ``src`` to ``dst``. PULSE
+    fades with a smaller pop and is staggered within a frame.
+    """
+
+    def __init__(self, draw):
+        self.draw = draw
+        self.kind = bytearray()
+        self.t0 = array('d')
+        self.rgba = array('f')
+        self.active = []
+        self.event = None
+        self.burst = (-1.0, 0)
+        self.steps = 0
+
+    def __len__(self):
+        return len(self.active)
+
+    def start(self, idx, kind, src, dst):
+        """Animate cell ``idx`` from color ``src`` to ``dst``, replacing
+        whatever it was doing"""
+        n = len(self.kind)
+        if idx >= n:
+            grow = idx + 1 - n
+            self.kind.extend(bytes(grow))
+            self.t0.extend([0.0] * grow)
+            self.rgba.extend([0.0] * 8 * grow)
+        now = Clock.get_time()
+        if kind == PULSE:
+            t, k = self.burst
+            k = k + 1 if t == now else 0
+            self.burst = (now, k)
+            now += min(k, MAX_STAGGER) * STAGGER
+        if not self.kind[idx]:
+            self.active.append(idx)
+        self.kind[idx] = kind
+        self.t0[idx] = now
+        o = idx * 8
+        self.rgba[o:o + 8] = array('f', (*src, *dst))
+        if self.event is None:
+            self.event = Clock.schedule_interval(self.step, 0)
+
+    def finish(self):
+        """Draw every animation at its end"""
+        if self.active:
+            self.step(None, Clock.get_time() + 1e3)
+
+    def step(self, dt, now=None):
+        if now is None:
+            now = Clock.get_time()
+        self.steps += 1
+        kind, t0, c, draw = self.kind, self.t0, self.rgba, self.draw
+        running = []
+        for idx in self.active:
+            k = kind[idx]
+            t = (now - t0[idx]) / DURATION[k]
+            if t < 0:
+                running.append(idx)
+                continue
+            o = idx * 8
+            if t >= 1:
+                kind[idx] = NONE
+                draw(idx, c[o + 4:o + 8], 1.0, 1.0, True)
+                continue
+            running.append(idx)
+            if k == FLIP:
+                front = t >= 0.5
+                o += 4 * front
+                draw(idx, c[o:o + 4], abs(math.cos(math.pi * t)), 1.0, front)
+                continue
+            # Ease out: fast start, slow settle
+            u = 1 - (1 - t) * (1 - t)
+            rgba = [a + (b - a) * u for a, b in zip(c[o:o + 4], c[o + 4:o + 8])]
+            s = 1 + (0.12 if k == FLASH else 0.08) * math.sin(math.pi * t)
+            draw(idx, rgba, s, s, True)
+        self.active = running
+        if not running:
+            self._stop()
+
+    def _stop(self):
+        if self.event is not None:
+            self.event.cancel()
+            self.event = None
@@ -0,0 +1,543 @@
+"""
+THE 77 - Board widgets
+All boards take the same calls from GameScreen: show, set_cell,
+set_colors, reshape and resize, and fire on_cell(idx) when a cell is tapped.
+set_cell(..., animate=False) draws the state at once on boards that animate.
+"""
+
+from kivy.uix.widget import Widget
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.button import Button
+from kivy.uix.scrollview import ScrollView
+from kivy.graphics import Color, Rectangle, RoundedRectangle, InstructionGroup
+from kivy.logger import Logger
+from kivy.metrics import dp
+from engine import CLOSED, WRONG
+from textures import TEXTURES
+from anim import CellAnimator, FLIP, FLASH, PULSE
+from tier import TIER
+
+def background():
+    """Board background shape: rounded unless the device tier turns corners off"""
+    return RoundedRectangle(radius=[dp(8)]) if TIER.rounded else Rectangle()
+
+class CellPool:
+    """Keeps cell Buttons across games and grid shape changes.
+
+    Buttons are created on demand, bound to ``on_cell`` once and then
+    only re-parented or re-colored. ``created`` counts every Button ever
+    made and ``ops`` maps the last operation name to the number of
+    widgets it created, so steady-state play can be checked for zero.
+    """
+
+    def __init__(self, on_cell):
+        self.on_cell = on_cell
+        self.buttons = []
+        self.grid = None
+        self.shown = 0
+        self.created = 0
+        self.ops = {}
+
+    def show(self, grid, n, op='new_game'):
+        """Put the first ``n`` pooled buttons into ``grid`` in index order"""
+        before = self.created
+        while len(self.buttons) < n:
+            btn = Button(text='', background_normal='', bold=True)
+            btn.idx = len(self.buttons)
+            btn.drawn = -1
+            btn.bind(on_release=self.on_cell)
+            self.buttons.append(btn)
+            self.created += 1
+
+        if grid is not self.grid:
+            for btn in self.buttons[:self.shown]:
+                if btn.parent:
+                    btn.parent.remove_widget(btn)
+            self.grid = grid
+            self.shown = 0
+
+        # GridLayout lays children out in insertion order
+        for btn in self.buttons[self.shown:n]:
+            grid.add_widget(btn)
+        for btn in self.buttons[n:self.shown]:
+            grid.remove_widget(btn)
+        self.shown = n
+
+        self.count(op, self.created - before)
+        return self.buttons[:n]
+
+    def reshape(self, cols):
+        """Reflow the shown buttons for a new column count"""
+        if self.grid:
+            self.grid.cols = cols
+        self.count('rebuild_grid', 0)
+
+    def count(self, op, n):
+        self.ops[op] = n
+        Logger.debug(f"CellPool: {op} created {n} widgets ({self.created} total)")
+
+# ============== BUTTON BOARD ==============
+class ButtonBoard(GridLayout):
+    """One pooled Button per cell inside a GridLayout"""
+    __events__ = ('on_cell',)
+
+    def __init__(self, **kw):
+        super().__init__(cols=6, spacing=dp(2), padding=dp(6), size_hint=(None, None),
+                         row_force_default=True, col_force_default=True, **kw)
+        with self.canvas.before:
+            self.bg_color = Color()
+            self.bg = background()
+        self.bind(pos=lambda w, p: setattr(self.bg, 'pos', p),
+                  size=lambda w, s: setattr(self.bg, 'size', s))
+        self.pool = CellPool(lambda btn: self.dispatch('on_cell', btn.idx))
+        self.cells = []
+        self.nums = ()
+        self.colors = {}
+        self.text_color = (1, 1, 1, 1)
+
+    @property
+    def n(self):
+        return len(self.cells)
+
+    def on_cell(self, idx):
+        pass
+
+    def set_colors(self, bg, text, colors):
+        self.bg_color.rgba = bg
+        self.text_color = text
+        self.colors = colors
+        for btn in self.cells:
+            btn.color = text
+            if btn.drawn >= 0:
+                btn.background_color = colors[btn.drawn]
+
+    def show(self, nums):
+        """Bind the board to a new permutation with every cell closed"""
+        self.nums = nums
+        self.cells = self.pool.show(self, len(nums))
+        for btn in self.cells:
+            btn.color = self.text_color
+            self.set_cell(btn.idx, CLOSED)
+
+    def set_cell(self, idx, state, animate=True):
+        btn = self.cells[idx]
+        if btn.drawn == state:
+            return
+        was_closed = btn.drawn in (CLOSED, -1)
+        btn.drawn = state
+        btn.background_color = self.colors[state]
+        if state == CLOSED:
+            btn.text = ''
+        elif was_closed:
+            btn.text = str(self.nums[idx])
+
+    def reshape(self, rows, cols):
+        self.pool.reshape(cols)
+
+    def resize(self, cell_w, cell_h):
+        """Size cells and the board; returns the board size"""
+        rows = -(-self.n // self.cols)
+        self.row_default_height = cell_h
+        self.col_default_width = cell_w
+        sp, pad = self.spacing[0], self.padding[0]
+        self.size = (cell_w * self.cols + sp * (self.cols - 1) + pad * 2,
+                     cell_h * rows + sp * (rows - 1) + pad * 2)
+        font_size = min(cell_w, cell_h) * 0.45
+        for btn in self.cells:
+            if btn.font_size != font_size:
+                btn.font_size = font_size
+        return self.size
+
+# ============== CANVAS BOARD ==============
+class GridBoard(Widget):
+    """Every cell drawn by canvas instructions in a single widget.
+
+    The board owns one InstructionGroup holding the background, a
+    Color + Rectangle per cell and a textured Rectangle per number.
+    Number textures come pre-colored from the shared TEXTURES cache, so
+    revealing a cell is a texture swap. Taps are mapped to a cell index
+    from the touch position. State changes are animated by one
+    CellAnimator while both ``animate`` and the device tier allow it:
+    cells flip when they open or close, flash when wrong and pulse when
+    a checkpoint is solved.
+    ``face`` holds the state whose number is on show, which lags
+    ``drawn`` during the first half of a flip.
+    """
+    __events__ = ('on_cell',)
+
+    def __init__(self, **kw):
+        kw.setdefault('size_hint', (None, None))
+        super().__init__(**kw)
+        self.spacing = dp(2)
+        self.pad = dp(6)
+        self.rows = self.cols = 0
+        self.cell_w = self.cell_h = 0
+        self.font_size = 0
+        self.nums = ()
+        self.drawn = bytearray()
+        self.face = bytearray()
+        self.colors = {}
+        self.tex_color = (1, 1, 1, 1)
+        self.created = 0
+        self.animate = True
+        self.anim = CellAnimator(self._draw_anim)
+
+        self.group = InstructionGroup()
+        self.bg_color = Color()
+        self.group.add(self.bg_color)
+        self.bg = background()
+        self.group.add(self.bg)
+        self.cell_group = InstructionGroup()
+        self.group.add(self.cell_group)
+        self.group.add(Color(1, 1, 1, 1))
+        self.text_group = InstructionGroup()
+        self.group.add(self.text_group)
+        self.canvas.add(self.group)
+
+        self.fills = []
+        self.rects = []
+        self.labels = []
+        self.bind(pos=self._place)
+
+    @property
+    def n(self):
+        return len(self.nums)
+
+    def on_cell(self, idx):
+        pass
+
+    def on_touch_down(self, touch):
+        if not self.n or not self.collide_point(*touch.pos):
+            return super().on_touch_down(touch)
+        step_w = self.cell_w + self.spacing
+        step_h = self.cell_h + self.spacing
+        x = touch.x - self.x - self.pad
+        y = self.top - self.pad - touch.y
+        col, row = int(x // step_w), int(y // step_h)
+        # Taps on the spacing between cells miss, like gaps between Buttons
+        if (0 <= col < self.cols and 0 <= row < self.rows
+                and x - col * step_w <= self.cell_w and y - row * step_h <= self.cell_h):
+            idx = row * self.cols + col
+            if idx < self.n:
+                self.dispatch('on_cell', idx)
+        return True
+
+    def set_colors(self, bg, text, colors):
+        self.bg_color.rgba = bg
+        self.colors = colors
+        recolor = tuple(text) != self.tex_color
+        self.tex_color = tuple(text)
+        for i in range(self.n):
+            self.fills[i].rgba = colors[self.drawn[i]]
+            if recolor and self.face[i] != CLOSED:
+                self._put_label(i)
+
+    def show(self, nums):
+        """Bind the board to a new permutation with every cell closed"""
+        n = len(nums)
+        while len(self.rects) < n:
+            fill = Color(*self.colors.get(CLOSED, (0, 0, 0, 0)))
+            rect = Rectangle(size=(0, 0))
+            label = Rectangle(size=(0, 0))
+            self.cell_group.add(fill)
+            self.cell_group.add(rect)
+            self.text_group.add(label)
+            self.fills.append(fill)
+            self.rects.append(rect)
+            self.labels.append(label)
+            self.created += 1
+        for i in range(n, len(self.rects)):
+            self.rects[i].size = (0, 0)
+            self.labels[i].size = (0, 0)
+
+        # Cells caught mid-animation get their full size back first
+        self.anim.finish()
+        old = self.drawn
+        self.nums = nums
+        self.drawn = bytearray(n)
+        self.face = bytearray(n)
+        closed = self.colors.get(CLOSED)
+        for i in range(n):
+            if i >= len(old) or old[i] != CLOSED:
+                self.fills[i].rgba = closed
+                self.labels[i].texture = None
+                self.labels[i].size = (0, 0)
+
+    def set_cell(self, idx, state, animate=True):
+        old = self.drawn[idx]
+        if old == state:
+            return
+        self.drawn[idx] = state
+        if animate and self.animate and TIER.animate and self.font_size:
+            dst = self.colors[state]
+            if state == WRONG:
+                flash = tuple(a + (1 - a) * 0.6 for a in dst[:3]) + (dst[3],)
+                self.anim.start(idx, FLASH, flash, dst)
+            elif old == CLOSED or state == CLOSED:
+                self.anim.start(idx, FLIP, self.fills[idx].rgba, dst)
+            else:
+                self.anim.start(idx, PULSE, self.fills[idx].rgba, dst)
+            return
+        if len(self.anim):
+            self.anim.finish()
+        self.face[idx] = state
+        self.fills[idx].rgba = self.colors[state]
+        label = self.labels[idx]
+        if state == CLOSED:
+            label.texture = None
+            label.size = (0, 0)
+        elif old == CLOSED:
+            self._put_label(idx)
+
+    def _draw_anim(self, idx, rgba, sx, sy, front):
+        """One animation frame of a cell: color, scale about its center, face"""
+        self.fills[idx].rgba = rgba
+        if front:
+            self.face[idx] = self.drawn[idx]
+        x, y = self._cell_pos(idx)
+        w, h = self.cell_w * sx, self.cell_h * sy
+        rect = self.rects[idx]
+        rect.pos = (x + (self.cell_w - w) / 2, y + (self.cell_h - h) / 2)
+        rect.size = (w, h)
+        label = self.labels[idx]
+        if self.face[idx] == CLOSED:
+            label.texture = None
+            label.size = (0, 0)
+            return
+        if label.size[0]:
+            tex = label.texture
+        else:
+            # A hidden label may hold Kivy's default texture
+            tex = label.texture = TEXTURES.get(self.nums[idx], self.font_size, True, self.tex_color)
+        w, h = tex.width * sx, tex.height * sy
+        label.size = (w, h)
+        label.pos = (int(x + (self.cell_w - w) / 2), int(y + (self.cell_h - h) / 2))
+
+    def reshape(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+
+    def resize(self, cell_w, cell_h):
+        """Size cells and the board; returns the board size"""
+        self.cell_w = cell_w
+        self.cell_h = cell_h
+        self.font_size = min(cell_w, cell_h) * 0.45
+        self.size = (cell_w * self.cols + self.spacing * (self.cols - 1) + self.pad * 2,
+                     cell_h * self.rows + self.spacing * (self.rows - 1) + self.pad * 2)
+        self._place()
+        return self.size
+
+    def _put_label(self, idx):
+        label = self.labels[idx]
+        if not self.font_size:
+            return
+        tex = TEXTURES.get(self.nums[idx], self.font_size, True, self.tex_color)
+        x, y = self._cell_pos(idx)
+        label.texture = tex
+        label.size = tex.size
+        label.pos = (int(x + (self.cell_w - tex.width) / 2),
+                     int(y + (self.cell_h - tex.height) / 2))
+
+    def _cell_pos(self, idx):
+        row, col = divmod(idx, self.cols)
+        return (self.x + self.pad + col * (self.cell_w + self.spacing),
+                self.top - self.pad - row * (self.cell_h + self.spacing) - self.cell_h)
+
+    def _place(self, *args):
+        """Position background, cells and labels for the current geometry"""
+        self.bg.pos = self.pos
+        self.bg.size = self.size
+        if not self.cols:
+            return
+        step_w = self.cell_w + self.spacing
+        step_h = self.cell_h + self.spacing
+        left = self.x + self.pad
+        top = self.top - self.pad
+        size = (self.cell_w, self.cell_h)
+        for i in range(self.n):
+            row, col = divmod(i, self.cols)
+            rect = self.rects[i]
+            rect.pos = (left + col * step_w, top - row * step_h - self.cell_h)
+            rect.size = size
+            if self.face[i] != CLOSED:
+                self._put_label(i)
+
+# ============== SCROLL BOARD ==============
+class ScrollBoard(ScrollView):
+    """Canvas board for boards too large to fit, scrolling vertically.
+
+    Only the rows in view are drawn: a pool of cell slots is re-bound to
+    the visible rows whenever the scroll position crosses a row, so the
+    instruction count follows the viewport rather than the board. Numbers
+    are composed from the ten shared digit textures. Set ``max_height``
+    before ``resize`` to cap the viewport.
+    """
+    __events__ = ('on_cell',)
+
+    def __init__(self, **kw):
+        kw.setdefault('size_hint', (None, None))
+        super().__init__(do_scroll_x=False, bar_width=dp(4), **kw)
+        self.spacing = dp(2)
+        self.pad = dp(6)
+        self.rows = self.cols = 0
+        self.cell_w = self.cell_h = 0
+        self.font_size = 0
+        self.max_height = 0
+        self.nums = ()
+        self.drawn = bytearray()
+        self.colors = {}
+        self.tex_color = (1, 1, 1, 1)
+        self.glyphs = None
+        self.first = -1
+        self.slots = 0
+        self.created = 0
+
+        with self.canvas.before:
+            self.bg_color = Color()
+            self.bg = background()
+        self.content = Widget(size_hint=(None, None))
+        self.cell_group = InstructionGroup()
+        self.text_group = InstructionGroup()
+        self.content.canvas.add(self.cell_group)
+        self.content.canvas.add(Color(1, 1, 1, 1))
+        self.content.canvas.add(self.text_group)
+        self.content.bind(on_touch_down=self._on_content_touch)
+        self.add_widget(self.content)
+
+        self.fills = []
+        self.rects = []
+        self.digits = []
+        self.bind(pos=self._place_bg, size=self._place_bg,
+                  scroll_y=self._bind_rows, height=self._bind_rows)
+
+    @property
+    def n(self):
+        return len(self.nums)
+
+    def on_cell(self, idx):
+        pass
+
+    def _on_content_touch(self, content, touch):
+        if not self.n or not content.collide_point(*touch.pos):
+            return False
+        step_w = self.cell_w + self.spacing
+        step_h = self.cell_h + self.spacing
+        x = touch.x - self.pad
+        y = content.height - self.pad - touch.y
+        col, row = int(x // step_w), int(y // step_h)
+        if (0 <= col < self.cols and 0 <= row < self.rows
+                and x - col * step_w <= self.cell_w and y - row * step_h <= self.cell_h):
+            idx = row * self.cols + col
+            if idx < self.n:
+                self.dispatch('on_cell', idx)
+        return True
+
+    def set_colors(self, bg, text, colors):
+        self.bg_color.rgba = bg
+        self.colors = colors
+        if tuple(text) != self.tex_color:
+            self.tex_color = tuple(text)
+            self.glyphs = None
+        self._bind_rows(force=True)
+
+    def show(self, nums):
+        """Bind the board to a new permutation with every cell closed"""
+        self.nums = nums
+        self.drawn = bytearray(len(nums))
+        width = len(str(len(nums)))
+        for digits in self.digits:
+            while len(digits) < width:
+                digits.append(self._digit())
+        self.scroll_y = 1
+        self._bind_rows(force=True)
+
+    def set_cell(self, idx, state, animate=True):
+        if self.drawn[idx] == state:
+            return
+        self.drawn[idx] = state
+        k = idx - self.first
+        if 0 <= k < self.slots:
+            self._paint(k, idx)
+
+    def reshape(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+
+    def resize(self, cell_w, cell_h):
+        """Size cells, content and viewport; returns the viewport size"""
+        self.cell_w = cell_w
+        self.cell_h = cell_h
+        self.font_size = min(cell_w, cell_h) * 0.45
+        self.glyphs = None
+        self.content.size = (cell_w * self.cols + self.spacing * (self.cols - 1) + self.pad * 2,
+                             cell_h * self.rows + self.spacing * (self.rows - 1) + self.pad * 2)
+        h = self.content.height
+        self.size = (self.content.width, min(h, self.max_height) if self.max_height else h)
+        self._bind_rows(force=True)
+        return self.size
+
+    def _place_bg(self, *args):
+        self.bg.pos = self.pos
+        self.bg.size = self.size
+
+    def _digit(self):
+        rect = Rectangle(size=(0, 0))
+        self.text_group.add(rect)
+        return rect
+
+    def _bind_rows(self, *args, force=False):
+        """Point the slot pool at the rows under the viewport"""
+        if not self.cols or not self.cell_h:
+            return
+        step_h = self.cell_h + self.spacing
+        h = self.content.height
+        top = self.scroll_y * max(0, h - self.height) + self.height
+        first = max(0, int((h - top - self.pad) // step_h)) * self.cols
+        slots = max(0, min(self.n - first, (int(self.height // step_h) + 2) * self.cols))
+        if not force and first == self.first and slots == self.slots:
+            return
+        width = len(str(self.n))
+        while len(self.rects) < slots:
+            fill = Color()
+            rect = Rectangle(size=(0, 0))
+            self.cell_group.add(fill)
+            self.cell_group.add(rect)
+            self.fills.append(fill)
+            self.rects.append(rect)
+            self.digits.append([self._digit() for _ in range(width)])
+            self.created += 1
+        self.first = first
+        for k in range(slots):
+            self._paint(k, first + k)
+        for k in range(slots, self.slots):
+            self.rects[k].size = (0, 0)
+            for d in self.digits[k]:
+                d.size = (0, 0)
+        self.slots = slots
+
+    def _paint(self, k, idx):
+        row, col = divmod(idx, self.cols)
+        x = self.pad + col * (self.cell_w + self.spacing)
+        y = self.content.height - self.pad - row * (self.cell_h + self.spacing) - self.cell_h
+        state = self.drawn[idx]
+        self.fills[k].rgba = self.colors[state]
+        rect = self.rects[k]
+        rect.pos = (x, y)
+        rect.size = (self.cell_w, self.cell_h)
+        digits = self.digits[k]
+        if state == CLOSED or not self.font_size:
+            for d in digits:
+                d.size = (0, 0)
+            return
+        if self.glyphs is None:
+            self.glyphs = [TEXTURES.get(i, self.font_size, True, self.tex_color)
+                           for i in range(10)]
+        texs = [self.glyphs[ord(c) - 48] for c in str(self.nums[idx])]
+        tx = int(x + (self.cell_w - sum(t.width for t in texs)) / 2)
+        for d, tex in zip(digits, texs):
+            d.texture = tex
+            d.size = tex.size
+            d.pos = (tx, int(y + (self.cell_h - tex.height) / 2))
+            tx += tex.width
+        for d in digits[len(texs):]:
+            d.size = (0, 0)
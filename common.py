@@ -0,0 +1,126 @@
+"""
+THE 77 - Shared app state
+Palette shortcuts, persistence and the screen base class
+"""
+
+from base64 import b64decode, b64encode
+from kivy.uix.screenmanager import Screen
+from kivy.graphics import Color, Rectangle
+from kivy.core.window import Window
+from palette import PALETTE
+from storage import WriteBehindStore
+
+C = PALETTE.c
+T = PALETTE.t
+
+def fmt_time(s):
+    """Whole seconds as the game shows them: 42s, 1:05"""
+    return f"{s}s" if s < 60 else f"{s//60}:{s%60:02d}"
+
+class DataStore:
+    def __init__(self):
+        self.db = WriteBehindStore('the77data.json')
+    def get_best(self, t, d):
+        k = f"{t}_{d}"
+        return self.db.get(k)['v'] if self.db.exists(k) else None
+    def set_best(self, t, d, v, replay=None):
+        k = f"{t}_{d}"
+        old = self.get_best(t, d)
+        if old is None or v < old:
+            if replay:
+                self.db.put(k, v=v, replay=b64encode(replay).decode('ascii'))
+            else:
+                self.db.put(k, v=v)
+            return True
+        return False
+    def get_replay(self, t, d):
+        k = f"{t}_{d}"
+        r = self.db.get(k).get('replay') if self.db.exists(k) else None
+        return b64decode(r) if r else None
+    def load(self):
+        if self.db.exists('cfg'):
+            c = self.db.get('cfg')
+            PALETTE.theme = c.get('theme', 'light')
+            PALETTE.lang = c.get('lang', 'TR')
+    def save(self):
+        self.db.put('cfg', theme=PALETTE.theme, lang=PALETTE.lang)
+    def save_game(self, **snap):
+        self.db.put('resume', **snap)
+    def load_game(self):
+        return self.db.get('resume') if self.db.exists('resume') else None
+    def clear_game(self):
+        self.db.delete('resume')
+    def load_device(self):
+        # A copy: callers edit it while the flush thread may be serialising
+        return dict(self.db.get('device')) if self.db.exists('device') else {}
+    def save_device(self, **device):
+        self.db.put('device', **device)
+    def flush(self):
+        self.db.flush()
+
+DB = DataStore()
+
+# ============== BASE ==============
+class ThemedScreen(Screen):
+    """Screen whose widget tree is built on first entry and then only
+    re-colored and re-labelled when PALETTE changes"""
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.built = False
+        self.colors = []
+        self.texts = []
+        PALETTE.bind(theme=self.recolor, lang=self.relabel)
+    
+    def on_pre_enter(self):
+        self.ensure_built()
+        self.relabel()
+    
+    def ensure_built(self):
+        if not self.built:
+            self.build()
+            self.built = True
+            self.on_theme()
+    
+    def build(self):
+        pass
+    
+    def on_theme(self):
+        pass
+    
+    def power_state(self):
+        """'active' while something on screen changes by itself, else 'idle'"""
+        return 'idle'
+    
+    def paint(self, obj, **keys):
+        """Set obj.<attr> = C(key) now and again on every theme change"""
+        for attr, key in keys.items():
+            self.colors.append((obj, attr, key))
+            setattr(obj, attr, C(key))
+        return obj
+    
+    def say(self, widget, text):
+        """Keep widget.text equal to text(), re-evaluated on relabel"""
+        self.texts.append((widget, text))
+        widget.text = text()
+        return widget
+    
+    def recolor(self, *args):
+        if not self.built:
+            return
+        rgba = PALETTE.rgba
+        for obj, attr, key in self.colors:
+            setattr(obj, attr, rgba[key])
+        self.on_theme()
+        self.relabel()
+    
+    def relabel(self, *args):
+        for widget, text in self.texts:
+            t = text()
+            if widget.text != t:
+                widget.text = t
+    
+    def background(self, root):
+        with root.canvas.before:
+            self.paint(Color(), rgba='bg')
+            self.bg = Rectangle(size=Window.size)
+        root.bind(size=lambda w, s: setattr(self.bg, 'size', s))
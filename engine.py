@@ -0,0 +1,193 @@
+"""
+THE 77 - Game rules
+Kivy-free board state for easy / medium / hard play
+"""
+
+from array import array
+import random
+import struct
+
+CLOSED, OPEN, SOLVED, WRONG = 0, 1, 2, 3
+DIFFS = ('easy', 'medium', 'hard')
+# Seconds a wrong tap shows before its feedback; medium and hard hold input until then
+HOLD = 0.35
+# Shortest gap between two taps a person can make, in seconds
+MIN_GAP = 0.02
+# version, total, difficulty, seed, next_num, wrong, taps, mistakes, resets, len(run)
+SNAPSHOT = struct.Struct('<BHBIHhIIIH')
+
+def checkpoint(total):
+    """Cells per medium-mode checkpoint: one per 11 cells, 3 to 10"""
+    return min(10, max(3, total // 11))
+
+class GameEngine:
+    """Board state in flat arrays.
+
+    ``nums[i]`` is the number under cell ``i`` and ``state[i]`` one of
+    CLOSED/OPEN/SOLVED/WRONG. ``tap`` and ``feedback`` return the cells
+    they changed as a list of ``(idx, state)`` pairs.
+    """
+
+    def __init__(self, total, diff='easy', seed=None):
+        self.total = total
+        self.diff = diff
+        self.cp = checkpoint(total) if diff == 'medium' else 1
+        self.nums = array('H')
+        self.state = bytearray(total)
+        self.run = array('H')
+        self.next_num = 1
+        self.wrong = -1
+        self.seed = None
+        self.taps = 0
+        self.mistakes = 0
+        self.resets = 0
+        self.new_game(seed)
+
+    def new_game(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        nums = list(range(1, self.total + 1))
+        random.Random(seed).shuffle(nums)
+        self.nums = array('H', nums)
+        self.state = bytearray(self.total)
+        self.run = array('H')
+        self.next_num = 1
+        self.wrong = -1
+        self.taps = 0
+        self.mistakes = 0
+        self.resets = 0
+
+    def snapshot(self):
+        """Whole board as bytes: header, then nums, state and run.
+        Arrays are in native byte order; snapshots stay on one device."""
+        head = SNAPSHOT.pack(1, self.total, DIFFS.index(self.diff), self.seed, self.next_num,
+                             self.wrong, self.taps, self.mistakes, self.resets, len(self.run))
+        return head + self.nums.tobytes() + bytes(self.state) + self.run.tobytes()
+
+    @classmethod
+    def restore(cls, blob):
+        """Engine from ``snapshot()`` bytes; ValueError if they do not fit"""
+        if len(blob) < SNAPSHOT.size:
+            raise ValueError("snapshot too short")
+        (version, total, diff, seed, next_num, wrong,
+         taps, mistakes, resets, nrun) = SNAPSHOT.unpack_from(blob)
+        if version != 1 or diff >= len(DIFFS) or len(blob) != SNAPSHOT.size + total * 3 + nrun * 2:
+            raise ValueError("not a snapshot")
+        e = cls.__new__(cls)
+        e.total = total
+        e.diff = DIFFS[diff]
+        e.cp = checkpoint(total) if e.diff == 'medium' else 1
+        e.seed = seed
+        pos = SNAPSHOT.size
+        e.nums = array('H', blob[pos:pos + total * 2])
+        pos += total * 2
+        e.state = bytearray(blob[pos:pos + total])
+        e.run = array('H', blob[pos + total:])
+        e.next_num = next_num
+        e.wrong = wrong
+        e.taps = taps
+        e.mistakes = mistakes
+        e.resets = resets
+        return e
+
+    @property
+    def won(self):
+        return self.next_num > self.total
+
+    def tap(self, idx):
+        """Apply a tap on cell ``idx``; a WRONG cell in the diff means
+        ``feedback(idx)`` is due once the flash has been shown"""
+        st = self.state
+        if self.won or st[idx] == SOLVED:
+            return []
+        if self.diff == 'easy':
+            diff = self._do_easy(idx)
+        elif self.diff == 'medium':
+            diff = self._do_medium(idx)
+        else:
+            diff = self._do_hard(idx)
+        if diff:
+            self.taps += 1
+            if diff[-1][1] == WRONG:
+                self.mistakes += 1
+        return diff
+
+    def feedback(self, idx):
+        """Undo after a wrong tap on ``idx``"""
+        if self.diff == 'easy':
+            return self._close_wrong(idx)
+        self.resets += 1
+        if self.diff == 'medium':
+            return self._reset_cp(idx)
+        return self._reset_all()
+
+    def _close_wrong(self, idx):
+        if self.state[idx] != WRONG:
+            return []
+        self.state[idx] = CLOSED
+        if self.wrong == idx:
+            self.wrong = -1
+        return [(idx, CLOSED)]
+
+    def _do_easy(self, idx):
+        diff = []
+        if self.wrong >= 0:
+            diff += self._close_wrong(self.wrong)
+        if self.nums[idx] == self.next_num:
+            self.state[idx] = SOLVED
+            self.next_num += 1
+            diff.append((idx, SOLVED))
+        else:
+            self.state[idx] = WRONG
+            self.wrong = idx
+            diff.append((idx, WRONG))
+        return diff
+
+    def _do_medium(self, idx):
+        if idx in self.run:
+            return []
+        st = self.state
+        if self.nums[idx] == self.next_num:
+            self.run.append(idx)
+            self.next_num += 1
+            done = self.next_num - 1
+            if done % self.cp == 0 or done == self.total:
+                diff = []
+                for i in self.run:
+                    st[i] = SOLVED
+                    diff.append((i, SOLVED))
+                self.run = array('H')
+                return diff
+            st[idx] = OPEN
+            return [(idx, OPEN)]
+        st[idx] = WRONG
+        return [(idx, WRONG)]
+
+    def _do_hard(self, idx):
+        if self.nums[idx] == self.next_num:
+            self.state[idx] = SOLVED
+            self.next_num += 1
+            return [(idx, SOLVED)]
+        self.state[idx] = WRONG
+        return [(idx, WRONG)]
+
+    def _reset_cp(self, clicked):
+        st = self.state
+        diff = []
+        for i in self.run:
+            st[i] = CLOSED
+            diff.append((i, CLOSED))
+        self.run = array('H')
+        if st[clicked] != SOLVED and st[clicked] != CLOSED:
+            st[clicked] = CLOSED
+            diff.append((clicked, CLOSED))
+        self.next_num = ((self.next_num - 1) // self.cp) * self.cp + 1
+        return diff
+
+    def _reset_all(self):
+        st = self.state
+        diff = [(i, CLOSED) for i in range(self.total) if st[i]]
+        self.state = bytearray(self.total)
+        self.next_num = 1
+        return diff
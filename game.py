@@ -0,0 +1,553 @@
+"""
+THE 77 - Game screen
+"""
+
+from kivy.app import App
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.floatlayout import FloatLayout
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.widget import Widget
+from kivy.graphics import Color, Rectangle, RoundedRectangle
+from kivy.core.window import Window
+from kivy.clock import Clock
+from kivy.metrics import dp, sp
+import os
+import time as pytime
+from base64 import b64decode, b64encode
+from engine import GameEngine, CLOSED, OPEN, SOLVED, WRONG, HOLD
+from board import GridBoard, ButtonBoard, ScrollBoard
+import layout
+from history import RunHistory
+from replay import Recorder, HOLD_MS
+from sync import ScoreSync
+from common import C, T, DB, ThemedScreen, fmt_time
+
+BOARD = "canvas"
+BOARDS = {"canvas": GridBoard, "buttons": ButtonBoard}
+
+# Below this cell size the board scrolls instead of shrinking
+MIN_CELL = dp(40)
+MARGIN = dp(8)
+
+HISTORY = RunHistory('the77runs.bin', DB.db)
+# New records wait here until THE77_LEADERBOARD (an http(s) URL) takes them
+SYNC = ScoreSync('the77outbox.jsonl', DB.db, os.environ.get('THE77_LEADERBOARD'))
+
+# ============== FEEDBACK ==============
+class FeedbackScheduler:
+    """Delayed undo after wrong taps, with one Clock event per board.
+
+    ``schedule`` (re)arms a single trigger; a newer wrong tap replaces the
+    pending one, so resets coalesce however fast the board is tapped. When
+    ``blocking`` is set, taps arriving before the reset are queued and
+    replayed in order through ``tap`` once it has been applied, with
+    repeated taps on one cell collapsed. ``cancel``
+    bumps ``gen`` and drops everything, so nothing from an old game can
+    reach the next one.
+    """
+
+    def __init__(self, settle, tap, delay=HOLD):
+        self.settle = settle
+        self.tap = tap
+        self.event = Clock.create_trigger(self.fire, delay)
+        self.gen = 0
+        self.due = -1
+        self.blocking = False
+        self.queue = []
+
+    def schedule(self, idx, blocking):
+        self.due = idx
+        self.blocking = blocking
+        self.event.cancel()
+        self.event()
+
+    def hold(self, idx):
+        """Queue ``idx`` if a blocking reset is pending; True if queued"""
+        if self.due < 0 or not self.blocking:
+            return False
+        # Repeats of the same cell collapse into one tap
+        if idx != (self.queue[-1] if self.queue else self.due):
+            self.queue.append(idx)
+        return True
+
+    def cancel(self):
+        self.gen += 1
+        self.event.cancel()
+        self.due = -1
+        self.queue = []
+
+    def fire(self, dt=None):
+        idx, self.due = self.due, -1
+        self.event.cancel()
+        if idx < 0:
+            return
+        gen = self.gen
+        self.settle(idx)
+        queued, self.queue = self.queue, []
+        for k, i in enumerate(queued):
+            if self.gen != gen:
+                return
+            self.tap(i)
+            if self.due >= 0 and self.blocking:
+                # Another reset is due; the rest waits for it
+                self.queue = queued[k + 1:] + self.queue
+                return
+
+# ============== GAME ==============
+class GameScreen(ThemedScreen):
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.container = None
+        self.overlay = None
+        self.board = BOARDS[BOARD]()
+        self.board.bind(on_cell=lambda b, idx: self._on_cell(idx))
+        self.boards = {type(self.board): self.board}
+        self.pending = {}
+        self.flush_trigger = Clock.create_trigger(self._flush)
+        self.feedback = FeedbackScheduler(lambda idx: self._apply(self.engine.feedback(idx)),
+                                          self._on_cell)
+        self.engine = None
+        self.resume = None
+        self.recorder = Recorder()
+        self.start_t = 0
+        self.pause_t = 0
+        self.total_p = 0
+        self.paused = False
+        self.won = False
+        self.logged = False
+        # Game time before which taps are ignored after a wrong one
+        self.held_until = 0
+        self.timer = None
+        self.shown_s = -1
+        self.total = 0
+        self.current_rows = 0
+        self.current_cols = 0
+        self.layout_trigger = Clock.create_trigger(lambda dt: self._on_container_resize(None, None))
+        self.layout_cache = {}
+        self.last_layout = None
+        self.layout_stats = {'events': 0, 'passes': 0, 'cache_hits': 0, 'skipped': 0}
+    
+    def on_pre_enter(self):
+        app = App.get_running_app()
+        self.engine = None
+        if self.resume:
+            try:
+                self.engine = GameEngine.restore(b64decode(self.resume['engine']))
+                app.gtotal, app.gdiff = self.engine.total, self.engine.diff
+            except (ValueError, KeyError):
+                self.resume = None
+        if self.engine is None:
+            self.engine = GameEngine(app.gtotal, app.gdiff)
+        self.total = self.engine.total
+        super().on_pre_enter()
+    
+    def on_enter(self):
+        if self.resume:
+            snap, self.resume = self.resume, None
+            Clock.schedule_once(lambda dt: self._restore(snap), 0.1)
+        else:
+            Clock.schedule_once(lambda dt: self.new_game(), 0.1)
+    
+    def on_leave(self):
+        self.feedback.cancel()
+        self._stop_timer()
+        self._record(False)
+        DB.clear_game()
+    
+    def power_state(self):
+        # Paused and won boards wait for a touch
+        return 'idle' if self.paused or self.won or not self.engine else 'active'
+    
+    def build(self):
+        self.make_ui()
+    
+    def on_theme(self):
+        self.board.set_colors(C('grid'), C('tw'), {CLOSED: C('cell'), OPEN: C('correct'),
+                                                   SOLVED: C('solved'), WRONG: C('wrong')})
+    
+    def make_ui(self):
+        root = BoxLayout(orientation='vertical')
+        with root.canvas.before:
+            self.paint(Color(), rgba='bg')
+            self.bgr = Rectangle(size=Window.size)
+        root.bind(size=lambda w, s: setattr(self.bgr, 'size', s))
+        
+        # Top bar
+        top = BoxLayout(size_hint_y=None, height=dp(44), padding=dp(5), spacing=dp(5))
+        with top.canvas.before:
+            self.paint(Color(), rgba='bg2')
+            self.topr = Rectangle()
+        top.bind(size=lambda w, s: setattr(self.topr, 'size', s),
+                pos=lambda w, p: setattr(self.topr, 'pos', p))
+        
+        bb = Button(font_size=sp(14), bold=True, background_normal='', size_hint_x=0.15)
+        self.say(self.paint(bb, background_color='b2', color='tw'), lambda: T('back'))
+        bb.bind(on_release=lambda x: self.go_back())
+        top.add_widget(bb)
+        
+        top.add_widget(self.say(self.paint(Label(font_size=sp(20), bold=True), color='t1'),
+                                lambda: f"THE {self.total}"))
+        
+        nb = Button(font_size=sp(13), background_normal='', size_hint_x=0.18)
+        self.say(self.paint(nb, background_color='bok', color='tw'), lambda: T('newgame'))
+        nb.bind(on_release=lambda x: self.new_game())
+        top.add_widget(nb)
+        root.add_widget(top)
+        
+        # Info bar
+        info = BoxLayout(size_hint_y=None, height=dp(36), padding=[dp(10), 0])
+        self.next_lbl = self.paint(Label(text=f"{T('next')} 1", font_size=sp(16), bold=True,
+                                         size_hint_x=0.35), color='solved')
+        info.add_widget(self.next_lbl)
+        
+        self.time_lbl = self.paint(Label(text=f"{T('time')} 0s", font_size=sp(15)), color='t1')
+        info.add_widget(self.time_lbl)
+        
+        self.pause_btn = Button(text="||", font_size=sp(16), bold=True, background_normal='',
+                                size_hint_x=0.12)
+        self.paint(self.pause_btn, background_color='bwarn', color='tw')
+        self.pause_btn.bind(on_release=lambda x: self.toggle_pause())
+        info.add_widget(self.pause_btn)
+        root.add_widget(info)
+        
+        # Grid container
+        self.container = FloatLayout()
+        self.container.add_widget(self.board)
+        self.container.bind(size=self._queue_layout, pos=self._queue_layout)
+        root.add_widget(self.container)
+        
+        # Progress
+        prog = BoxLayout(size_hint_y=None, height=dp(32), padding=[dp(15), dp(8)])
+        prog_bg = Widget()
+        with prog_bg.canvas:
+            self.paint(Color(), rgba='b2')
+            self.pbg = RoundedRectangle(radius=[dp(5)])
+            self.paint(Color(), rgba='bwarn')
+            self.pfill = RoundedRectangle(radius=[dp(5)])
+        
+        def upd_prog(w, s):
+            self.pbg.size = (s[0], dp(12))
+            self.pbg.pos = (w.pos[0], w.pos[1])
+            self.pfill.pos = self.pbg.pos
+            self._upd_progress()
+        prog_bg.bind(size=upd_prog, pos=lambda w, p: upd_prog(w, w.size))
+        prog.add_widget(prog_bg)
+        root.add_widget(prog)
+        
+        self.prog_lbl = self.paint(Label(text=f"0/{self.total}", font_size=sp(13),
+                                         size_hint_y=None, height=dp(24)), color='t2')
+        root.add_widget(self.prog_lbl)
+        
+        self.add_widget(root)
+        
+        # Win overlay, shown by _win
+        self.overlay = FloatLayout()
+        with self.overlay.canvas:
+            self.ov_color = Color()
+            self.ov_bg = Rectangle(size=Window.size)
+        self.overlay.bind(size=lambda w, s: setattr(self.ov_bg, 'size', s))
+        self.overlay.add_widget(self.say(self.paint(
+            Label(font_size=sp(32), bold=True, pos_hint={'center_x': 0.5, 'center_y': 0.55}),
+            color='correct'), lambda: T('congrats')))
+        self.rec_lbl = self.say(self.paint(
+            Label(font_size=sp(22), pos_hint={'center_x': 0.5, 'center_y': 0.45}),
+            color='solved'), lambda: T('record'))
+        self.overlay.add_widget(self.rec_lbl)
+        self.final_lbl = self.paint(
+            Label(font_size=sp(20), pos_hint={'center_x': 0.5, 'center_y': 0.35}), color='t1')
+        self.overlay.add_widget(self.final_lbl)
+    
+    def _queue_layout(self, *args):
+        """Coalesce container size/pos events into one layout pass per frame"""
+        self.layout_stats['events'] += 1
+        self.layout_trigger()
+    
+    def _grid_for(self, cw, ch):
+        """Memoized rows, cols, cell size and whether the board must scroll"""
+        key = (cw, ch, self.total, dp(1))
+        hit = self.layout_cache.get(key)
+        if hit:
+            self.layout_stats['cache_hits'] += 1
+            return hit
+        
+        inset = MARGIN + dp(6)
+        rows, cols, cell_w, cell_h = layout.solve(self.total, cw, ch, dp(2), inset)
+        virtual = min(cell_w, cell_h) < MIN_CELL
+        if virtual:
+            rows, cols, cell_w, cell_h = layout.scroll(self.total, cw, dp(2), inset, MIN_CELL)
+        
+        if len(self.layout_cache) > 32:
+            self.layout_cache.clear()
+        self.layout_cache[key] = (rows, cols, cell_w, cell_h, virtual)
+        return self.layout_cache[key]
+    
+    def _on_container_resize(self, widget, value):
+        """Resize and reposition grid when container changes"""
+        if not self.container or self.container.width <= 1 or self.container.height <= 1:
+            return
+        if not self.board.n:
+            return
+        self.layout_stats['passes'] += 1
+        
+        cw = self.container.width
+        ch = self.container.height
+        
+        shape = self._grid_for(cw, ch)
+        rows, cols, cell_w, cell_h, virtual = shape
+        if self._use_board(virtual):
+            # Carry the game over to the other board
+            self.pending.clear()
+            self.board.show(self.engine.nums)
+            for idx, state in enumerate(self.engine.state):
+                if state:
+                    self.board.set_cell(idx, state, animate=False)
+        if virtual:
+            self.board.max_height = ch - MARGIN * 2
+        
+        # Only rebuild if grid shape changed
+        if rows != self.current_rows or cols != self.current_cols:
+            self._rebuild_grid(rows, cols)
+        
+        # Apply cell sizes (can be rectangular now!) unless they are unchanged
+        if shape != self.last_layout:
+            self.last_layout = shape
+            self.board.resize(cell_w, cell_h)
+        else:
+            self.layout_stats['skipped'] += 1
+        
+        # Center in container
+        grid_w, grid_h = self.board.size
+        self.board.pos = (
+            self.container.x + (cw - grid_w) / 2,
+            self.container.y + (ch - grid_h) / 2
+        )
+    
+    def _use_board(self, virtual):
+        """Put the scrolling or the regular board in the container; True if swapped"""
+        cls = ScrollBoard if virtual else BOARDS[BOARD]
+        if type(self.board) is cls:
+            return False
+        board = self.boards.get(cls)
+        if board is None:
+            board = self.boards[cls] = cls()
+            board.bind(on_cell=lambda b, idx: self._on_cell(idx))
+        self.container.remove_widget(self.board)
+        self.board = board
+        self.container.add_widget(board)
+        self.on_theme()
+        self.current_rows = self.current_cols = 0
+        self.last_layout = None
+        return True
+    
+    def _rebuild_grid(self, new_rows, new_cols):
+        """Reshape the board when orientation changes"""
+        if not self.board.n:
+            return
+        
+        self.current_rows = new_rows
+        self.current_cols = new_cols
+        self.board.reshape(new_rows, new_cols)
+    
+    def new_game(self):
+        self.feedback.cancel()
+        self._record(False)
+        DB.clear_game()
+        self.engine.new_game()
+        self.recorder.start(self.engine)
+        self._begin(0, False)
+    
+    def _restore(self, snap):
+        """Continue a game saved by ``suspend``, paused"""
+        try:
+            self.recorder.resume(b64decode(snap['replay']))
+        except (ValueError, KeyError):
+            self.recorder.start(self.engine)
+        self._begin(snap.get('elapsed', 0), True)
+        self.held_until = snap.get('held', 0)
+    
+    def _begin(self, elapsed, paused):
+        """Show the current engine state with ``elapsed`` seconds on the clock"""
+        self.feedback.cancel()
+        self.logged = False
+        self.held_until = 0
+        now = pytime.monotonic()
+        self.start_t = now - elapsed
+        self.pause_t = now
+        self.total_p = 0
+        self.paused = paused
+        self.pause_btn.text = ">" if paused else "||"
+        self.won = False
+        self.current_rows = 0
+        self.current_cols = 0
+        self.last_layout = None
+        
+        # Remove win overlay
+        if self.overlay.parent:
+            self.remove_widget(self.overlay)
+        
+        # Re-bind the board to the permutation, then draw the cells already in play
+        self.pending.clear()
+        if self.container.width > 1:
+            self._use_board(self._grid_for(self.container.width, self.container.height)[4])
+        self.board.show(self.engine.nums)
+        if any(self.engine.state):
+            for idx, state in enumerate(self.engine.state):
+                if state:
+                    self.board.set_cell(idx, state, animate=False)
+        
+        # Trigger layout
+        self.layout_trigger()
+        
+        self._upd_ui()
+        
+        self.shown_s = -1
+        self.time_lbl.text = f"{T('time')} {fmt_time(int(elapsed))}"
+        self._start_timer()
+    
+    def suspend(self):
+        """Stop every Clock event and save the game, e.g. on app pause"""
+        e = self.engine
+        if e is None:
+            return
+        # Settle pending resets so the snapshot is a resting state; a held
+        # tap replayed by fire() may be wrong and schedule another one
+        while self.feedback.due >= 0:
+            self.feedback.fire()
+        self.feedback.cancel()
+        self.flush_trigger.cancel()
+        self._flush()
+        self._stop_timer()
+        if not self.paused:
+            self.toggle_pause()
+        # Nothing worth restoring yet, or already over
+        if self.won or not e.taps:
+            return
+        DB.save_game(engine=b64encode(e.snapshot()).decode('ascii'),
+                     replay=b64encode(self.recorder.blob()).decode('ascii'),
+                     elapsed=self.pause_t - self.start_t - self.total_p,
+                     held=self.held_until)
+    
+    def _set_cell(self, idx, state):
+        self.board.set_cell(idx, state)
+    
+    def _apply(self, diff):
+        """Queue a (idx, state) diff from the engine for the next frame"""
+        for idx, state in diff:
+            self.pending[idx] = state
+        self.flush_trigger()
+    
+    def _flush(self, dt=None):
+        """Draw queued cell changes, skipping cells that end up unchanged"""
+        for idx, state in self.pending.items():
+            self._set_cell(idx, state)
+        self.pending.clear()
+        self._upd_ui()
+    
+    def _elapsed(self):
+        return pytime.monotonic() - self.start_t - self.total_p
+    
+    def _start_timer(self):
+        self._stop_timer()
+        self._tick(0)
+    
+    def _stop_timer(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+    
+    def _tick(self, dt):
+        """Show elapsed seconds, then sleep until the next second boundary"""
+        self.timer = None
+        if self.won or self.paused:
+            return
+        e = self._elapsed()
+        s = int(e)
+        if s != self.shown_s:
+            self.shown_s = s
+            self.time_lbl.text = f"{T('time')} {fmt_time(s)}"
+        self.timer = Clock.schedule_once(self._tick, s + 1 - e)
+    
+    def _upd_ui(self):
+        n = self.engine.next_num
+        self.next_lbl.text = f"{T('next')} {n}"
+        self.prog_lbl.text = f"{n - 1}/{self.total}"
+        self._upd_progress()
+    
+    def _upd_progress(self):
+        if self.engine and self.pbg.size[0] > 0:
+            p = (self.engine.next_num - 1) / self.total
+            self.pfill.size = (self.pbg.size[0] * p, dp(12))
+    
+    def toggle_pause(self):
+        if self.won:
+            return
+        self.paused = not self.paused
+        if self.paused:
+            self.pause_t = pytime.monotonic()
+            self._stop_timer()
+            self.pause_btn.text = ">"
+        else:
+            self.total_p += pytime.monotonic() - self.pause_t
+            self._start_timer()
+            self.pause_btn.text = "||"
+            # Play moves on from any snapshot saved by suspend
+            DB.clear_game()
+    
+    def _on_cell(self, idx):
+        if self.won or self.paused or self.feedback.hold(idx):
+            return
+        
+        elapsed = self._elapsed()
+        # The reset runs on the wall clock, so a pause or suspend can settle
+        # it early; input stays held for HOLD of game time, as replays check
+        if elapsed < self.held_until:
+            return
+        diff = self.engine.tap(idx)
+        if not diff:
+            return
+        # Only taps that changed the board go into the replay
+        self.recorder.tap(idx, elapsed)
+        self._apply(diff)
+        if diff[-1][1] == WRONG:
+            # Easy only closes the cell, so play goes on; resets hold input
+            blocking = self.engine.diff != 'easy'
+            self.feedback.schedule(idx, blocking)
+            if blocking:
+                self.held_until = elapsed + HOLD_MS / 1000
+        elif self.engine.won:
+            self._win()
+    
+    def _win(self):
+        self.won = True
+        self._stop_timer()
+        
+        elapsed = self._elapsed()
+        final = int(elapsed)
+        self._record(True, elapsed)
+        blob = self.recorder.blob()
+        rec = DB.set_best(self.total, self.engine.diff, final, blob)
+        if rec:
+            SYNC.submit(self.total, self.engine.diff, final, blob)
+        DB.clear_game()
+        
+        self.ov_color.rgba = (*C('bg')[:3], 0.93)
+        self.rec_lbl.opacity = 1 if rec else 0
+        self.final_lbl.text = f"{T('time')} {fmt_time(final)}"
+        self.add_widget(self.overlay)
+    
+    def _record(self, won, duration=None):
+        """Append the current game to HISTORY, once per game"""
+        e = self.engine
+        if self.logged or e is None or not (won or e.taps):
+            return
+        self.logged = True
+        if duration is None:
+            duration = self._elapsed()
+            if self.paused:
+                duration -= pytime.monotonic() - self.pause_t
+        HISTORY.append(self.total, e.diff, won, duration, e.mistakes, e.resets)
+    
+    def go_back(self):
+        self._stop_timer()
+        App.get_running_app().goto('diff')
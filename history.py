@@ -0,0 +1,206 @@
+"""
+THE 77 - Run history
+Append-only log of every finished or abandoned game, with running stats
+"""
+
+import os
+import struct
+import threading
+import time
+
+# timestamp, board size, difficulty, won, duration ms, wrong taps, resets
+RECORD = struct.Struct('<IHBBIHH')
+DIFFS = ('easy', 'medium', 'hard')
+QUANTILES = (0.5, 0.9)
+
+class P2Quantile:
+    """Streaming quantile estimate in constant memory (Jain & Chlamtac P-square)"""
+
+    def __init__(self, p, state=None):
+        self.p = p
+        if state:
+            self.q, self.n, self.np = state
+        else:
+            self.q = []
+            self.n = [1, 2, 3, 4, 5]
+            self.np = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.dn = [0, p / 2, p, (1 + p) / 2, 1]
+
+    @property
+    def state(self):
+        return [list(self.q), list(self.n), list(self.np)]
+
+    def add(self, x):
+        q, n = self.q, self.n
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+        for i in (1, 2, 3):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def value(self):
+        q = self.q
+        if not q:
+            return None
+        if len(q) < 5:
+            return q[min(len(q) - 1, int(self.p * len(q)))]
+        return q[2]
+
+class RunHistory:
+    """Fixed-width binary log plus per (board, difficulty) aggregates.
+
+    Record ``i`` lives at byte ``i * RECORD.size``, so any slice of history
+    can be read by seeking. Aggregates (count, wins, mean, best, p50/p90
+    of winning durations, mistakes and resets) are updated on append and
+    kept in ``store`` under ``stats_<total>_<diff>`` keys together with
+    the number of records they cover; on startup only records past that
+    number are replayed. Appends are buffered and written by ``flush``,
+    which the store calls from its background thread.
+    """
+
+    def __init__(self, path, store):
+        self.path = path
+        self.store = store
+        self.lock = threading.Lock()
+        self.pending = bytearray()
+        self.aggs = {}
+        self.applied = store.get('history')['n'] if store.exists('history') else 0
+        store.hooks.append(self.flush)
+        self._catch_up()
+
+    def __len__(self):
+        return self.applied
+
+    def _catch_up(self):
+        try:
+            nbytes = os.path.getsize(self.path)
+        except OSError:
+            nbytes = 0
+        size, torn = divmod(nbytes, RECORD.size)
+        if torn:
+            # Drop a record cut short by a crash so later appends stay aligned
+            with open(self.path, 'r+b') as f:
+                f.truncate(size * RECORD.size)
+        if size < self.applied:
+            # Log was lost or truncated: rebuild the aggregates from what is left
+            for k in [k for k in self.store.data if k.startswith('stats_')]:
+                self.store.delete(k)
+            self.aggs = {}
+            self.applied = 0
+        if size > self.applied:
+            for rec in self.records(self.applied):
+                self._add(*rec[1:])
+            self._save()
+
+    def _agg(self, total, diff):
+        k = f"stats_{total}_{diff}"
+        a = self.aggs.get(k)
+        if a is None:
+            if self.store.exists(k):
+                a = dict(self.store.get(k))
+            else:
+                a = {'count': 0, 'won': 0, 'sum_ms': 0, 'best_ms': None,
+                     'mistakes': 0, 'resets': 0, 'q': [None] * len(QUANTILES)}
+            a['p'] = [P2Quantile(p, s) for p, s in zip(QUANTILES, a['q'])]
+            self.aggs[k] = a
+        return k, a
+
+    def _add(self, total, diff_id, won, duration_ms, mistakes, resets):
+        k, a = self._agg(total, DIFFS[diff_id])
+        a['count'] += 1
+        a['mistakes'] += mistakes
+        a['resets'] += resets
+        if won:
+            a['won'] += 1
+            a['sum_ms'] += duration_ms
+            if a['best_ms'] is None or duration_ms < a['best_ms']:
+                a['best_ms'] = duration_ms
+            for est in a['p']:
+                est.add(duration_ms)
+        self.applied += 1
+        return k
+
+    def _save(self, keys=None):
+        for k in (keys or self.aggs):
+            a = self.aggs[k]
+            a['q'] = [est.state for est in a['p']]
+            self.store.put(k, **{f: v for f, v in a.items() if f != 'p'})
+        self.store.put('history', n=self.applied)
+
+    def append(self, total, diff, won, duration, mistakes=0, resets=0):
+        """Log one game; ``duration`` in seconds"""
+        rec = (int(time.time()), total, DIFFS.index(diff), int(bool(won)),
+               min(int(duration * 1000), 0xFFFFFFFF), min(mistakes, 0xFFFF), min(resets, 0xFFFF))
+        with self.lock:
+            self.pending += RECORD.pack(*rec)
+        self._save([self._add(*rec[1:])])
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            blob = bytes(self.pending)
+            self.pending.clear()
+        try:
+            with open(self.path, 'ab') as f:
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError:
+            with self.lock:
+                self.pending[:0] = blob
+            raise
+
+    def records(self, start=0, count=None):
+        """Yield (timestamp, total, diff index, won, duration ms, mistakes, resets)"""
+        try:
+            f = open(self.path, 'rb')
+        except OSError:
+            return
+        with f:
+            f.seek(start * RECORD.size)
+            n = 0
+            while count is None or n < count:
+                chunk = f.read(RECORD.size)
+                if len(chunk) < RECORD.size:
+                    return
+                yield RECORD.unpack(chunk)
+                n += 1
+
+    def stats(self, total, diff):
+        """Aggregates for one board; O(1) regardless of history length"""
+        _, a = self._agg(total, diff)
+        won = a['won']
+        return {'count': a['count'], 'won': won,
+                'abandoned': a['count'] - won,
+                'mean': a['sum_ms'] / won / 1000 if won else None,
+                'best': a['best_ms'] / 1000 if a['best_ms'] is not None else None,
+                'p50': _sec(a['p'][0].value()), 'p90': _sec(a['p'][1].value()),
+                'mistakes': a['mistakes'], 'resets': a['resets']}
+
+def _sec(ms):
+    return ms / 1000 if ms is not None else None
@@ -0,0 +1,41 @@
+"""
+THE 77 - Board layout
+Rows, columns and cell size for any number of cells and any container
+"""
+
+GOLDEN = 1.618
+
+def solve(n, w, h, spacing, inset, golden=GOLDEN):
+    """Largest cells for ``n`` cells in a ``w`` x ``h`` box.
+
+    Every column count is tried; each candidate's cells are clamped so
+    neither side is more than ``golden`` times the other, and the one
+    with the largest cell area wins, fewer empty slots breaking ties.
+    ``inset`` is the margin plus board padding on each side. Returns
+    (rows, cols, cell_w, cell_h); cell sizes are 0 if nothing fits.
+    """
+    best = None
+    for cols in range(1, n + 1):
+        rows = -(-n // cols)
+        # One column fewer gives the same rows with wider cells
+        if cols > 1 and -(-n // (cols - 1)) == rows:
+            continue
+        cw = (w - inset * 2 - spacing * (cols - 1)) / cols
+        ch = (h - inset * 2 - spacing * (rows - 1)) / rows
+        if cw <= 0 or ch <= 0:
+            continue
+        cw, ch = min(cw, ch * golden), min(ch, cw * golden)
+        key = (round(cw * ch, 6), n - rows * cols)
+        if best is None or key > best[0]:
+            best = (key, rows, cols, cw, ch)
+    if best is None:
+        return 1, n, 0, 0
+    return best[1:]
+
+def scroll(n, w, spacing, inset, cell):
+    """Rows and columns of at least ``cell`` wide square cells filling
+    width ``w``, for boards too large to fit; rows scroll"""
+    cols = max(1, int((w - inset * 2 + spacing) // (cell + spacing)))
+    cols = min(cols, n)
+    size = (w - inset * 2 - spacing * (cols - 1)) / cols
+    return -(-n // cols), cols, size, size
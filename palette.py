@@ -0,0 +1,80 @@
+"""
+THE 77 - Theme and language tables
+Compiled once per (theme, lang) into RGBA tuples and final strings
+"""
+
+from kivy.event import EventDispatcher
+from kivy.properties import StringProperty
+from kivy.utils import get_color_from_hex
+
+COLORS = {
+    "light": {"bg": "#FAF8EF", "bg2": "#EDE4D4", "grid": "#BBADA0", "cell": "#CDC1B4",
+              "correct": "#6ECE7A", "wrong": "#F65E3B", "solved": "#EDC22E",
+              "t1": "#776E65", "t2": "#A09588", "tw": "#FFFFFF", "b2": "#BBADA0",
+              "bok": "#6ECE7A", "bwarn": "#F59563", "bdanger": "#F65E3B"},
+    "dark": {"bg": "#1A1A2E", "bg2": "#16213E", "grid": "#2D2D44", "cell": "#4A4A6A",
+             "correct": "#4ADE80", "wrong": "#F87171", "solved": "#FACC15",
+             "t1": "#E2E8F0", "t2": "#94A3B8", "tw": "#FFFFFF", "b2": "#3D3D5C",
+             "bok": "#4ADE80", "bwarn": "#FB923C", "bdanger": "#F87171"}
+}
+
+TEXTS = {
+    "TR": {"select": "Oyun Sec", "diff": "Zorluk Sec", "easy": "KOLAY", "medium": "ORTA",
+           "hard": "ZOR", "back": "<", "newgame": "Yeni", "next": "Sira:", "time": "Sure:",
+           "congrats": "TEBRIKLER!", "record": "YENI REKOR!", "settings": "Ayarlar",
+           "theme": "Tema", "dark": "Koyu", "light": "Acik", "lang": "Dil",
+           "profiler": "Profil", "on": "Acik", "off": "Kapali",
+           "versus": "2 Oyuncu", "wins": "KAZANDI!", "quality": "Kalite",
+           "auto": "Otomatik", "low": "Dusuk", "mid": "Orta", "high": "Yuksek"},
+    "EN": {"select": "Select Game", "diff": "Select Difficulty", "easy": "EASY",
+           "medium": "MEDIUM", "hard": "HARD", "back": "<", "newgame": "New",
+           "next": "Next:", "time": "Time:", "congrats": "CONGRATULATIONS!",
+           "record": "NEW RECORD!", "settings": "Settings", "theme": "Theme",
+           "dark": "Dark", "light": "Light", "lang": "Language",
+           "profiler": "Profiler", "on": "On", "off": "Off",
+           "versus": "2 Players", "wins": "WINS!", "quality": "Quality",
+           "auto": "Auto", "low": "Low", "mid": "Medium", "high": "High"}
+}
+
+class Palette(EventDispatcher):
+    """Current colors and strings.
+
+    ``rgba`` maps color keys to ready tuples and ``strings`` maps text keys
+    to their final value for the current language, with English as the
+    fallback. Both are rebuilt only when ``theme`` or ``lang`` change, and
+    each (theme, lang) pair is compiled once per process. Bind to
+    ``theme``/``lang`` to follow changes.
+    """
+    theme = StringProperty('light')
+    lang = StringProperty('TR')
+    compiled = {}
+
+    def __init__(self, **kw):
+        self.rgba = {}
+        self.strings = {}
+        super().__init__(**kw)
+        self._compile()
+
+    def on_theme(self, *args):
+        self._compile()
+
+    def on_lang(self, *args):
+        self._compile()
+
+    def _compile(self):
+        key = (self.theme, self.lang)
+        hit = self.compiled.get(key)
+        if hit is None:
+            rgba = {k: tuple(get_color_from_hex(v)) for k, v in COLORS[self.theme].items()}
+            strings = dict(TEXTS["EN"])
+            strings.update(TEXTS.get(self.lang, {}))
+            hit = self.compiled[key] = (rgba, strings)
+        self.rgba, self.strings = hit
+
+    def c(self, k):
+        return self.rgba[k]
+
+    def t(self, k):
+        return self.strings.get(k, k)
+
+PALETTE = Palette()
@@ -0,0 +1,116 @@
+"""
+THE 77 - Power policy
+Main-loop rate follows what is on screen, with optional frame counting
+"""
+
+import time
+
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.logger import Logger
+
+# Main-loop wakeups per second for each screen state
+RATES = {'active': 60, 'idle': 8}
+# Seconds at the full rate after the last input or screen change
+LINGER = 1.5
+
+def limit_fps(fps):
+    """Set the main-loop rate; False if this Clock cannot be throttled.
+
+    Kivy has no public setter: graphics.maxfps is read once when the
+    Clock is created, then every clock backend reads the private
+    ``_max_fps`` each frame (checked against Kivy 2.3.1). On a Clock
+    without it the rate stays at the Config value.
+    """
+    if not hasattr(Clock, '_max_fps'):
+        return False
+    Clock._max_fps = float(fps)
+    return True
+
+class PowerPolicy:
+    """Lowers the Clock rate when nothing on screen can change by itself.
+
+    Kivy only draws when a canvas is invalidated, but the main loop still
+    wakes ``maxfps`` times a second. Input, resizes and screen changes put
+    it at the ``active`` rate; ``LINGER`` seconds later it drops to the
+    rate for the current screen's ``power_state()``; input is polled once
+    per wakeup, so the first touch on an idle screen is picked up within
+    1/8 s and everything after it runs at full rate. (Kivy's interrupt
+    clock would wake on scheduled events too, but it spins at any maxfps
+    on 2.3.) With ``measure`` on, frames drawn, loop wakeups and periodic
+    Clock events are counted per screen and state and logged by ``report``.
+    """
+
+    def __init__(self, sm, measure=False):
+        self.sm = sm
+        self.rates = dict(RATES)
+        self.state = None
+        self.warned = False
+        self.settle = Clock.create_trigger(self._settle, LINGER)
+        self.measure = measure
+        self.totals = {}
+        self.segment = None
+        Window.bind(on_touch_down=self.wake, on_touch_move=self.wake, on_touch_up=self.wake,
+                    on_key_down=self.wake, on_resize=self.wake)
+        sm.bind(current=self.wake)
+        self.wake()
+
+    def wake(self, *args):
+        self._set('active')
+        self.settle.cancel()
+        self.settle()
+
+    def _settle(self, dt):
+        if self.sm.transition.is_active:
+            self.settle()
+            return
+        screen = self.sm.current_screen
+        self._set(screen.power_state() if hasattr(screen, 'power_state') else 'idle')
+
+    def _set(self, state):
+        if self.measure:
+            self._count(state)
+        if state != self.state:
+            self.state = state
+            if not limit_fps(self.rates[state]) and not self.warned:
+                self.warned = True
+                Logger.warning("Power: this Clock has no frame limit, the rate stays fixed")
+
+    def set_rate(self, state, fps):
+        """Use ``fps`` wakeups per second for ``state`` from now on"""
+        self.rates[state] = fps
+        if state == self.state:
+            limit_fps(fps)
+
+    def _count(self, state):
+        key = (self.sm.current, state)
+        now = time.monotonic()
+        seg = self.segment
+        if seg and seg[0] == key:
+            return
+        if seg:
+            t = self.totals.setdefault(seg[0], [0.0, 0, 0, 0])
+            t[0] += now - seg[1]
+            t[1] += Clock.frames_displayed - seg[2]
+            t[2] += Clock.frames - seg[3]
+            t[3] = max(t[3], sum(1 for e in Clock.get_events() if e.loop))
+        self.segment = (key, now, Clock.frames_displayed, Clock.frames)
+
+    def report(self):
+        """Log frames and wakeups per minute for every screen and state seen"""
+        if not self.measure:
+            return {}
+        self._count(None)
+        self.segment = None
+        out = {}
+        for (screen, state), (secs, frames, wakeups, periodic) in sorted(self.totals.items()):
+            if secs <= 0:
+                continue
+            out[f"{screen}/{state}"] = r = {
+                'seconds': secs, 'frames_per_min': frames * 60 / secs,
+                'wakeups_per_min': wakeups * 60 / secs, 'periodic_events': periodic}
+            Logger.info(f"Power: {screen}/{state}: {r['frames_per_min']:.0f} frames/min, "
+                        f"{r['wakeups_per_min']:.0f} wakeups/min over {secs:.0f} s, "
+                        f"{periodic} periodic events")
+        self.totals = {}
+        return out
@@ -0,0 +1,261 @@
+"""
+THE 77 - Hot-path profiler
+Opt-in timing of UI handlers with a ring buffer, overlay and trace export
+"""
+
+from array import array
+import functools
+import json
+import time
+import weakref
+
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.core.text import LabelBase
+from kivy.graphics import Color, Rectangle
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.widget import Widget
+from kivy.metrics import dp, sp
+
+# (module, class, methods) timed while the profiler is enabled
+TARGETS = [
+    ('game', 'GameScreen', ('_on_cell', '_set_cell', '_flush', '_rebuild_grid',
+                            '_on_container_resize', 'new_game', '_win', 'on_enter')),
+    ('screens', 'DiffScreen', ('on_enter',)),
+    ('screens', 'SettingsScreen', ('on_enter',)),
+    ('common', 'ThemedScreen', ('on_pre_enter',)),
+]
+# Where Kivy dispatches callbacks: (row name, owner, method), patched on the
+# Clock's or the Window's class so everything run from there is one sample
+DISPATCH = [
+    ('Clock events', 'Clock', '_process_events'),
+    ('Clock before frame', 'Clock', '_process_events_before_frame'),
+    ('Window.on_touch_down', 'Window', 'on_touch_down'),
+    ('Window.on_touch_move', 'Window', 'on_touch_move'),
+    ('Window.on_touch_up', 'Window', 'on_touch_up'),
+    ('Window.on_draw', 'Window', 'on_draw'),
+]
+
+class Profiler:
+    """Times TARGETS and DISPATCH into a fixed-size ring buffer.
+
+    Methods are wrapped on ``enable`` and restored on ``disable``, so a
+    disabled profiler leaves the original functions in place and costs
+    nothing. Callbacks scheduled on the Clock while enabled are timed by
+    their own name as well. Also counts widget constructions, text
+    rasterizations and Clock scheduling calls while enabled.
+
+    A TARGETS method only gets its own row when it is looked up after
+    ``enable``. Bound methods captured before that run unwrapped and
+    are timed only within the DISPATCH rows: triggers made when a screen
+    is built (GameScreen's flush and layout triggers, FeedbackScheduler's
+    reset, the versus Players'), ``bind(on_release=...)`` handlers of
+    buttons (under Window.on_touch_up) and Window key bindings, which
+    are not timed at all.
+    """
+
+    def __init__(self, size=8192):
+        self.size = size
+        self.names = []
+        self.ids = {}
+        self.which = array('H', bytes(2 * size))
+        self.start = array('q', bytes(8 * size))
+        self.dur = array('q', bytes(8 * size))
+        self.pos = 0
+        self.count = 0
+        self.enabled = False
+        self.patched = []
+        self.counters = {'widgets': 0, 'text_textures': 0, 'clock_schedules': 0}
+        self.t0 = time.perf_counter_ns()
+
+    def record(self, name, t0, dt):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        p = self.pos
+        self.which[p] = i
+        self.start[p] = t0
+        self.dur[p] = dt
+        self.pos = (p + 1) % self.size
+        self.count += 1
+
+    def _timed(self, name, fn):
+        clock = time.perf_counter_ns
+        record = self.record
+
+        # wraps() keeps the name: Kivy's WeakMethod looks bound methods up by it
+        @functools.wraps(fn)
+        def wrapper(*args, **kw):
+            t0 = clock()
+            try:
+                return fn(*args, **kw)
+            finally:
+                record(name, t0, clock() - t0)
+        return wrapper
+
+    def _counted(self, key, fn):
+        counters = self.counters
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kw):
+            counters[key] += 1
+            return fn(*args, **kw)
+        return wrapper
+
+    def _scheduling(self, fn):
+        counters = self.counters
+        timed = self._timed_callback
+
+        @functools.wraps(fn)
+        def wrapper(callback, *args, **kw):
+            counters['clock_schedules'] += 1
+            return fn(timed(callback), *args, **kw)
+        return wrapper
+
+    def _timed_callback(self, callback):
+        """``callback`` timed as Clock:<name> while the profiler is enabled.
+        A bound method is still held weakly, as the Clock would hold it, by
+        a weakref.WeakMethod, which keeps the function rather than its name.
+        Bound methods of extension types have no function and are held."""
+        name = f"Clock:{getattr(callback, '__qualname__', type(callback).__name__)}"
+        clock = time.perf_counter_ns
+        record = self.record
+        ref = weakref.WeakMethod(callback) if hasattr(callback, '__func__') else lambda: callback
+
+        def wrapper(*args):
+            fn = ref()
+            if fn is None:
+                # Its owner is gone; False also ends an interval
+                return False
+            if not self.enabled:
+                return fn(*args)
+            t0 = clock()
+            try:
+                return fn(*args)
+            finally:
+                record(name, t0, clock() - t0)
+        return wrapper
+
+    def _patch(self, owner, attr, wrapper):
+        had = attr in vars(owner)
+        self.patched.append((owner, attr, had, vars(owner).get(attr)))
+        setattr(owner, attr, wrapper)
+
+    def enable(self):
+        if self.enabled:
+            return
+        from importlib import import_module
+        for mod, cls, methods in TARGETS:
+            klass = getattr(import_module(mod), cls)
+            for m in methods:
+                self._patch(klass, m, self._timed(f"{cls}.{m}", getattr(klass, m)))
+        # __class__, not type(): Clock is a context proxy
+        owners = {'Clock': Clock.__class__, 'Window': Window.__class__}
+        for name, owner, m in DISPATCH:
+            klass = owners[owner]
+            self._patch(klass, m, self._timed(name, getattr(klass, m)))
+        self._patch(Widget, '__init__', self._counted('widgets', Widget.__init__))
+        self._patch(LabelBase, 'refresh', self._counted('text_textures', LabelBase.refresh))
+        for m in ('schedule_once', 'schedule_interval', 'create_trigger'):
+            self._patch(Clock, m, self._scheduling(getattr(Clock, m)))
+        self.enabled = True
+
+    def disable(self):
+        for owner, attr, had, orig in reversed(self.patched):
+            if had:
+                setattr(owner, attr, orig)
+            else:
+                delattr(owner, attr)
+        self.patched = []
+        self.enabled = False
+
+    def samples(self):
+        """(name id, start ns, duration ns) for the buffered samples, oldest first"""
+        n = min(self.count, self.size)
+        first = (self.pos - n) % self.size
+        for k in range(n):
+            p = (first + k) % self.size
+            yield self.which[p], self.start[p], self.dur[p]
+
+    def stats(self):
+        """name -> (count, p50 ms, p99 ms) over the buffered samples"""
+        per = {}
+        for i, _, d in self.samples():
+            per.setdefault(i, []).append(d)
+        out = {}
+        for i, ds in per.items():
+            ds.sort()
+            out[self.names[i]] = (len(ds), ds[len(ds) // 2] / 1e6,
+                                  ds[min(len(ds) - 1, int(len(ds) * 0.99))] / 1e6)
+        return out
+
+    def export(self, path):
+        """Write the buffer as a Chrome trace (chrome://tracing, Perfetto)"""
+        events = [{'name': self.names[i], 'ph': 'X', 'pid': 1, 'tid': 1,
+                   'ts': (t - self.t0) / 1000, 'dur': d / 1000}
+                  for i, t, d in self.samples()]
+        now = (time.perf_counter_ns() - self.t0) / 1000
+        events.append({'name': 'counters', 'ph': 'C', 'pid': 1, 'ts': now,
+                       'args': dict(self.counters, clock_events=len(Clock.get_events()))})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+PROFILER = Profiler()
+
+class ProfilerOverlay(BoxLayout):
+    """p50/p99 table drawn over every screen, refreshed once a second"""
+
+    def __init__(self, export_path, **kw):
+        super().__init__(orientation='vertical', size_hint=(None, None),
+                         size=(dp(330), dp(260)), padding=dp(4), **kw)
+        self.export_path = export_path
+        with self.canvas.before:
+            Color(0, 0, 0, 0.7)
+            self.bg = Rectangle()
+        self.bind(pos=lambda w, p: setattr(self.bg, 'pos', p),
+                  size=lambda w, s: setattr(self.bg, 'size', s))
+        self.text = Label(font_size=sp(10), font_name='RobotoMono-Regular', halign='left',
+                          valign='top', color=(1, 1, 1, 1))
+        self.text.bind(size=lambda w, s: setattr(w, 'text_size', s))
+        self.add_widget(self.text)
+        eb = Button(text='Export trace', font_size=sp(11), size_hint_y=None, height=dp(28))
+        eb.bind(on_release=lambda x: self.export())
+        self.add_widget(eb)
+        self.note = ''
+        self.event = None
+
+    def show(self):
+        if not self.parent:
+            Window.add_widget(self)
+        self.pos = (Window.width - self.width, Window.height - self.height)
+        self.refresh(0)
+        self.event = Clock.schedule_interval(self.refresh, 1.0)
+
+    def hide(self):
+        if self.event:
+            self.event.cancel()
+            self.event = None
+        if self.parent:
+            Window.remove_widget(self)
+
+    def export(self):
+        try:
+            self.note = f"saved {PROFILER.export(self.export_path)}"
+        except OSError as e:
+            self.note = f"export failed: {e}"
+        self.refresh(0)
+
+    def refresh(self, dt):
+        rows = [f"{'handler':<31}{'n':>5}{'p50':>7}{'p99':>7}"]
+        for name, (n, p50, p99) in sorted(PROFILER.stats().items()):
+            rows.append(f"{name[-31:]:<31}{n:>5}{p50:>7.2f}{p99:>7.2f}")
+        c = PROFILER.counters
+        rows.append(f"widgets {c['widgets']}  text tex {c['text_textures']}")
+        rows.append(f"clock sched {c['clock_schedules']}  live {len(Clock.get_events())}")
+        if self.note:
+            rows.append(self.note)
+        self.text.text = '\n'.join(rows)
@@ -0,0 +1,138 @@
+"""
+THE 77 - Replays
+Compact tap logs and a renderless verifier that re-runs them
+"""
+
+import struct
+from engine import GameEngine, WRONG, HOLD, MIN_GAP
+
+# The game's reset fires on the first frame whose Clock time is past the
+# hold, timed from the start of the frame the wrong tap arrived in, so a
+# held tap may be applied up to a frame early
+JITTER_MS = 20
+HOLD_MS = int(HOLD * 1000) - JITTER_MS
+MIN_GAP_MS = int(MIN_GAP * 1000)
+# Taps queued during one reset, applied together when it ends
+MAX_BURST = int(HOLD / MIN_GAP)
+
+# magic, version, board size, difficulty, seed
+HEADER = struct.Struct('<BBHBI')
+MAGIC, VERSION = 0x77, 1
+DIFFS = ('easy', 'medium', 'hard')
+IDX = struct.Struct('<H')
+
+class Recorder:
+    """Tap log for the game being played.
+
+    ``start`` writes the header for a fresh engine; each ``tap`` appends
+    the milliseconds since the previous tap as a varint and the cell
+    index as a uint16, so a 77-cell game takes a few hundred bytes.
+    ``blob`` returns the log so far.
+    """
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.last_ms = 0
+
+    def start(self, engine):
+        self.buf = bytearray(HEADER.pack(MAGIC, VERSION, engine.total,
+                                         DIFFS.index(engine.diff), engine.seed))
+        self.last_ms = 0
+
+    def tap(self, idx, elapsed):
+        """Log a tap on ``idx`` at ``elapsed`` seconds of play"""
+        ms = int(elapsed * 1000)
+        dt = max(0, ms - self.last_ms)
+        self.last_ms += dt
+        buf = self.buf
+        while dt >= 0x80:
+            buf.append(dt & 0x7F | 0x80)
+            dt >>= 7
+        buf.append(dt)
+        buf += IDX.pack(idx)
+
+    def resume(self, blob):
+        """Carry on the log of an interrupted game"""
+        header(blob)
+        self.buf = bytearray(blob)
+        self.last_ms = sum(dt for dt, _ in taps(blob))
+
+    def blob(self):
+        return bytes(self.buf)
+
+def header(blob):
+    """(board size, difficulty, seed) of a log; ValueError if it is not one"""
+    if len(blob) < HEADER.size:
+        raise ValueError("replay too short")
+    magic, version, total, diff, seed = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != VERSION or diff >= len(DIFFS):
+        raise ValueError("not a replay")
+    return total, DIFFS[diff], seed
+
+def taps(blob):
+    """Yield (ms since previous tap, cell index) from a log"""
+    pos, end = HEADER.size, len(blob)
+    while pos < end:
+        dt = shift = 0
+        while True:
+            if pos >= end:
+                raise ValueError("truncated replay")
+            b = blob[pos]
+            pos += 1
+            dt |= (b & 0x7F) << shift
+            shift += 7
+            if b < 0x80:
+                break
+        if pos + 2 > end:
+            raise ValueError("truncated replay")
+        yield dt, IDX.unpack_from(blob, pos)[0]
+        pos += 2
+
+def replay(blob):
+    """Re-run a log through the rules and their timing; returns (engine,
+    ms at the last tap).
+
+    Wrong taps get their feedback straight away, which is the order the
+    game applies them in: resets hold later taps until they are done,
+    and easy-mode feedback only closes a cell the next tap closes anyway.
+    ValueError if a person could not have played the log: a tap inside
+    the hold after a wrong tap on medium or hard, or two taps less than
+    MIN_GAP_MS apart, except for the taps the game queued during a reset
+    and applies together when it ends.
+    """
+    total, diff, seed = header(blob)
+    e = GameEngine(total, diff, seed)
+    t = 0
+    held = -1
+    burst = 0
+    for k, (dt, idx) in enumerate(taps(blob)):
+        if idx >= total or e.won:
+            raise ValueError("tap outside the game")
+        t += dt
+        if held >= 0:
+            if t < held:
+                raise ValueError("tap during a reset")
+            held = -1
+            burst = MAX_BURST
+        elif k and dt < MIN_GAP_MS:
+            if not burst:
+                raise ValueError("taps too close together")
+            burst -= 1
+        else:
+            burst = 0
+        changed = e.tap(idx)
+        if changed and changed[-1][1] == WRONG:
+            e.feedback(idx)
+            if diff != 'easy':
+                held = t + HOLD_MS
+    return e, t
+
+def verify(blob, total, diff, seconds):
+    """True if ``blob`` solves a ``total``/``diff`` board within ``seconds``"""
+    try:
+        if header(blob)[:2] != (total, diff):
+            return False
+        e, t = replay(blob)
+    except ValueError:
+        return False
+    return e.won and t // 1000 <= seconds
@@ -0,0 +1,136 @@
+"""
+THE 77 - Difficulty and settings screens
+"""
+
+from kivy.app import App
+from kivy.uix.floatlayout import FloatLayout
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.metrics import sp
+from palette import PALETTE
+from common import T, DB, ThemedScreen
+from tier import TIER, TIERS
+
+# Largest board offered in versus; both must fit on one screen
+VERSUS_MAX = 77
+
+# ============== DIFFICULTY ==============
+class DiffScreen(ThemedScreen):
+    def build(self):
+        root = FloatLayout()
+        self.background(root)
+        
+        bb = Button(font_size=sp(16), bold=True, background_normal='', size_hint=(0.15, 0.05),
+                   pos_hint={'x': 0.02, 'top': 0.98})
+        self.say(self.paint(bb, background_color='b2', color='tw'), lambda: T('back'))
+        bb.bind(on_release=lambda x: App.get_running_app().goto('menu'))
+        root.add_widget(bb)
+        
+        root.add_widget(self.say(self.paint(Label(font_size=sp(50), bold=True,
+                                                  pos_hint={'center_x': 0.5, 'center_y': 0.78}),
+                                            color='t1'),
+                                 lambda: str(App.get_running_app().gtotal)))
+        root.add_widget(self.say(self.paint(Label(font_size=sp(18),
+                                                  pos_hint={'center_x': 0.5, 'center_y': 0.68}),
+                                            color='t2'), lambda: T('diff')))
+        
+        for d, c, y in [('easy', 'bok', 0.52), ('medium', 'bwarn', 0.38), ('hard', 'bdanger', 0.24)]:
+            b = Button(font_size=sp(22), bold=True, background_normal='',
+                      size_hint=(0.45, 0.08), pos_hint={'center_x': 0.5, 'center_y': y})
+            self.say(self.paint(b, background_color=c, color='tw'), lambda d=d: T(d))
+            b.bind(on_release=lambda x, df=d: self.go(df))
+            root.add_widget(b)
+        
+        self.vb = Button(font_size=sp(16), background_normal='', size_hint=(0.45, 0.06),
+                         pos_hint={'center_x': 0.5, 'center_y': 0.12})
+        self.say(self.paint(self.vb, background_color='b2', color='tw'),
+                 lambda: f"{T('versus')}: {T('on') if App.get_running_app().gversus else T('off')}")
+        self.vb.bind(on_release=lambda x: self.toggle_versus())
+        root.add_widget(self.vb)
+        self.add_widget(root)
+    
+    def on_pre_enter(self):
+        super().on_pre_enter()
+        fits = App.get_running_app().gtotal <= VERSUS_MAX
+        self.vb.opacity = 1 if fits else 0
+        self.vb.disabled = not fits
+    
+    def toggle_versus(self):
+        app = App.get_running_app()
+        app.gversus = not app.gversus
+        self.relabel()
+    
+    def go(self, d):
+        app = App.get_running_app()
+        app.gdiff = d
+        app.goto('versus' if app.gversus and app.gtotal <= VERSUS_MAX else 'game')
+
+# ============== SETTINGS ==============
+class SettingsScreen(ThemedScreen):
+    def build(self):
+        root = FloatLayout()
+        self.background(root)
+        
+        root.add_widget(self.say(self.paint(Label(font_size=sp(36), bold=True,
+                                                  pos_hint={'center_x': 0.5, 'center_y': 0.8}),
+                                            color='t1'), lambda: T('settings')))
+        
+        tb = Button(font_size=sp(18), background_normal='', size_hint=(0.5, 0.07),
+                   pos_hint={'center_x': 0.5, 'center_y': 0.62})
+        self.say(self.paint(tb, background_color='b2', color='tw'),
+                 lambda: f"{T('theme')}: {T('dark') if PALETTE.theme == 'light' else T('light')}")
+        tb.bind(on_release=lambda x: self.toggle_theme())
+        root.add_widget(tb)
+        
+        lb = Button(font_size=sp(18), background_normal='', size_hint=(0.5, 0.07),
+                   pos_hint={'center_x': 0.5, 'center_y': 0.51})
+        self.say(self.paint(lb, background_color='bwarn', color='tw'),
+                 lambda: f"{T('lang')}: {PALETTE.lang}")
+        lb.bind(on_release=lambda x: self.toggle_lang())
+        root.add_widget(lb)
+        
+        qb = Button(font_size=sp(16), background_normal='', size_hint=(0.5, 0.06),
+                   pos_hint={'center_x': 0.5, 'center_y': 0.40})
+        self.say(self.paint(qb, background_color='b2', color='tw'), self.quality_text)
+        qb.bind(on_release=lambda x: self.cycle_quality())
+        root.add_widget(qb)
+        
+        pb = Button(font_size=sp(14), background_normal='', size_hint=(0.5, 0.05),
+                   pos_hint={'center_x': 0.5, 'center_y': 0.31})
+        self.say(self.paint(pb, background_color='b2', color='tw'),
+                 lambda: f"{T('profiler')}: {T('on') if App.get_running_app().profiling else T('off')}")
+        pb.bind(on_release=lambda x: self.toggle_profiler())
+        root.add_widget(pb)
+        
+        bb = Button(font_size=sp(16), background_normal='', size_hint=(0.3, 0.06),
+                   pos_hint={'center_x': 0.5, 'center_y': 0.2})
+        self.say(self.paint(bb, background_color='b2', color='tw'), lambda: T('back'))
+        bb.bind(on_release=lambda x: App.get_running_app().goto('menu'))
+        root.add_widget(bb)
+        self.add_widget(root)
+    
+    def toggle_theme(self):
+        PALETTE.theme = 'dark' if PALETTE.theme == 'light' else 'light'
+        DB.save()
+    
+    def toggle_lang(self):
+        PALETTE.lang = 'EN' if PALETTE.lang == 'TR' else 'TR'
+        DB.save()
+    
+    def quality_text(self):
+        if DB.load_device().get('override'):
+            return f"{T('quality')}: {T(TIER.name)}"
+        return f"{T('quality')}: {T('auto')} ({T(TIER.name)})"
+    
+    def cycle_quality(self):
+        """Auto -> low -> mid -> high -> auto; auto is the calibrated tier"""
+        device = DB.load_device()
+        order = (None,) + TIERS
+        device['override'] = order[(order.index(device.get('override')) + 1) % len(order)]
+        DB.save_device(**device)
+        App.get_running_app().apply_tier()
+        self.relabel()
+    
+    def toggle_profiler(self):
+        App.get_running_app().toggle_profiler()
+        self.relabel()
@@ -0,0 +1,246 @@
+"""
+THE 77 - Game server
+Headless sessions on the app's rules over a line protocol, without Kivy
+
+    THE77_SERVER_SECRET=... python server.py [--host 127.0.0.1] [--port 7777]
+                                             [--results wins.jsonl]
+
+A client sends one command per line and gets exactly one reply line per
+command, in order, so commands can be pipelined:
+
+    NEW <size> <easy|medium|hard> [daily]
+        -> NEW <sid> <size> <difficulty>
+    TAP <sid> <idx>
+        -> TAP <sid> <next> <idx:state[:num],...>  changed cells, '-' if none
+        -> WIN <sid> <seconds> <taps> <mistakes> <resets> <idx:state[:num],...>
+    END <sid>   -> END <sid>
+    STATS       -> STATS <sessions> <taps> <wins> <refused> <peak rss KiB> <cpu ms>
+    (anything the server will not take) -> ERR <reason>
+
+A tap less than MIN_GAP after the previous one, or on medium and hard
+within HOLD of a wrong tap, is refused with ``ERR too-fast`` or
+``ERR held`` and can be sent again later.
+
+States are 0 closed, 1 open, 2 solved and 3 wrong. The board starts
+face down: a cell's number is only sent when it turns open, solved or
+wrong, as the app shows it, so the order has to be found by playing.
+Only the server seeds boards. ``daily`` seeds from the UTC date, size
+and difficulty hashed with THE77_SERVER_SECRET, so every player of the
+day's challenge gets the same board and nobody can work it out ahead.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import secrets
+import time
+from base64 import b64encode
+
+from engine import GameEngine, DIFFS, WRONG, HOLD, MIN_GAP
+from replay import Recorder
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Largest board a session may ask for (the menu offers up to 1000)
+MAX_SIZE = 1000
+MAX_SESSIONS = 100000
+# Seconds without a tap before a session is dropped
+TTL = 600.0
+# Longest command line accepted
+LINE_LIMIT = 256
+
+log = logging.getLogger('the77.server')
+
+def load_secret():
+    """Key for daily seeds from THE77_SERVER_SECRET, else a random one.
+
+    A random key gives a different daily board after every restart, so
+    servers that share the daily challenge must set the same secret.
+    """
+    secret = os.environ.get('THE77_SERVER_SECRET')
+    if not secret:
+        log.warning("THE77_SERVER_SECRET is not set; daily boards change on restart")
+        return secrets.token_bytes(32)
+    return hashlib.blake2s(secret.encode('utf-8')).digest()
+
+def daily_seed(key, total, diff, day=None):
+    """Seed shared by everyone playing ``total``/``diff`` on UTC ``day``"""
+    day = day or time.strftime('%Y-%m-%d', time.gmtime())
+    msg = f"{day}:{total}:{diff}".encode()
+    return int.from_bytes(hashlib.blake2s(msg, digest_size=4, key=key).digest(), 'little')
+
+class Session:
+    """One game: its engine, replay log and server-side clock"""
+    __slots__ = ('engine', 'recorder', 'start', 'last', 'held')
+
+    def __init__(self, engine, now):
+        self.engine = engine
+        self.recorder = Recorder()
+        self.recorder.start(engine)
+        self.start = now
+        self.last = 0.0
+        # Clock time the last wrong tap's feedback ends on medium and hard
+        self.held = 0.0
+
+class GameServer:
+    """Sessions keyed by an unguessable id, shared by all connections.
+
+    Rules come from GameEngine, so shuffling, the easy/medium/hard tap
+    handling and the checkpoint and full resets are the app's own. A
+    wrong tap gets its feedback at once, as replays do, and on medium
+    and hard taps are then refused until HOLD has passed, the time the
+    app's FeedbackScheduler shows the wrong cell for. Only taps that
+    change the board are logged, as in the game. Time runs on the
+    server from NEW to the winning tap and is floored to seconds like
+    the game screen's; clients only send cell indices. A won session is
+    closed and, with ``results``, appended to that file as a JSON line
+    in the leaderboard's entry format, replay included.
+    """
+
+    def __init__(self, results=None, ttl=TTL, key=None):
+        self.sessions = {}
+        self.key = key or load_secret()
+        self.ttl = ttl
+        self.results = open(results, 'a', encoding='utf-8', buffering=1) if results else None
+        self.stats = {'taps': 0, 'wins': 0, 'refused': 0}
+        self.commands = {'NEW': self.new, 'TAP': self.tap, 'END': self.end, 'STATS': self.report}
+
+    def handle(self, line, now=None):
+        """Reply line (without newline) for one command line"""
+        parts = line.decode('ascii', 'replace').split()
+        if not parts:
+            return "ERR empty"
+        cmd = self.commands.get(parts[0].upper())
+        if cmd is None:
+            return "ERR unknown-command"
+        try:
+            return cmd(parts[1:], time.monotonic() if now is None else now)
+        except (ValueError, IndexError):
+            return "ERR bad-arguments"
+
+    def new(self, args, now):
+        total, diff = int(args[0]), args[1].lower()
+        if not 1 <= total <= MAX_SIZE or diff not in DIFFS:
+            return "ERR bad-game"
+        if len(self.sessions) >= MAX_SESSIONS:
+            return "ERR full"
+        if len(args) > 2 and args[2] != 'daily':
+            return "ERR bad-arguments"
+        e = GameEngine(total, diff, daily_seed(self.key, total, diff) if len(args) > 2 else None)
+        sid = secrets.token_hex(6)
+        self.sessions[sid] = Session(e, now)
+        return f"NEW {sid} {total} {diff}"
+
+    def tap(self, args, now):
+        sid = args[0]
+        s = self.sessions.get(sid)
+        if s is None:
+            return "ERR unknown-session"
+        e = s.engine
+        idx = int(args[1])
+        if not 0 <= idx < e.total:
+            return "ERR bad-cell"
+        if now < s.held:
+            self.stats['refused'] += 1
+            return "ERR held"
+        if s.last and now - s.last < MIN_GAP:
+            self.stats['refused'] += 1
+            return "ERR too-fast"
+        s.last = now
+        changed = e.tap(idx)
+        if changed:
+            s.recorder.tap(idx, now - s.start)
+            if changed[-1][1] == WRONG:
+                changed += e.feedback(idx)
+                if e.diff != 'easy':
+                    s.held = now + HOLD
+        nums = e.nums
+        changes = ','.join(f"{i}:{st}:{nums[i]}" if st else f"{i}:{st}"
+                           for i, st in changed) or '-'
+        self.stats['taps'] += 1
+        if not e.won:
+            return f"TAP {sid} {e.next_num} {changes}"
+        del self.sessions[sid]
+        self.stats['wins'] += 1
+        seconds = int(now - s.start)
+        if self.results:
+            self._log(sid, e, seconds, s.recorder.blob())
+        return f"WIN {sid} {seconds} {e.taps} {e.mistakes} {e.resets} {changes}"
+
+    def end(self, args, now):
+        if self.sessions.pop(args[0], None) is None:
+            return "ERR unknown-session"
+        return f"END {args[0]}"
+
+    def report(self, args, now):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+        s = self.stats
+        return (f"STATS {len(self.sessions)} {s['taps']} {s['wins']} {s['refused']} {rss} "
+                f"{int(time.process_time() * 1000)}")
+
+    def _log(self, sid, e, seconds, blob):
+        entry = {'id': hashlib.blake2s(blob, digest_size=12).hexdigest(), 'size': e.total,
+                 'diff': e.diff, 'time': seconds, 'at': int(time.time()),
+                 'replay': b64encode(blob).decode('ascii'), 'session': sid}
+        self.results.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def sweep(self, now):
+        """Drop sessions idle for longer than ``ttl``; returns how many"""
+        stale = [sid for sid, s in self.sessions.items() if now - (s.last or s.start) > self.ttl]
+        for sid in stale:
+            del self.sessions[sid]
+        return len(stale)
+
+    async def serve(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(b"ERR line-too-long\n")
+                    break
+                if not line:
+                    break
+                writer.write(self.handle(line).encode('ascii') + b'\n')
+                # Returns at once unless the client stopped reading
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def run(self, host, port, ready=None):
+        srv = await asyncio.start_server(self.serve, host, port, limit=LINE_LIMIT)
+        port = srv.sockets[0].getsockname()[1]
+        log.info("listening on %s:%d", host, port)
+        if ready:
+            ready(port)
+        async with srv:
+            while True:
+                await asyncio.sleep(self.ttl / 4)
+                n = self.sweep(time.monotonic())
+                if n:
+                    log.info("dropped %d idle sessions, %d open", n, len(self.sessions))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=7777, help="0 picks a free port")
+    ap.add_argument('--results', help="append wins to this JSON-lines file")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    # The chosen port goes to stdout for scripts that start the server
+    ready = lambda port: print(f"PORT {port}", flush=True)
+    try:
+        asyncio.run(GameServer(args.results).run(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+THE 77 - Persistence
+In-memory key/value store with write-behind flushing to a JSON file
+"""
+
+import json
+import os
+import threading
+
+class WriteBehindStore:
+    """Drop-in for the JsonStore calls DataStore makes (exists/get/put).
+
+    The file is read once. ``put`` only updates memory and wakes a daemon
+    thread which waits ``delay`` seconds to batch further writes, then
+    writes a temp file, fsyncs it and renames it over the original, so a
+    crash leaves either the old or the new file, never a torn one.
+    Call ``flush`` to write synchronously, e.g. on app pause or stop.
+    Callables in ``hooks`` run at the start of every flush, on the same
+    thread, so other files can share the write-behind schedule.
+    """
+
+    def __init__(self, path, delay=1.0):
+        self.path = path
+        self.delay = delay
+        self.data = self._read()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.dirty = False
+        self.thread = None
+        self.writes = 0
+        self.hooks = []
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def exists(self, key):
+        return key in self.data
+
+    def get(self, key):
+        return self.data[key]
+
+    def put(self, key, **values):
+        with self.lock:
+            self.data[key] = values
+            self.dirty = True
+        self.kick()
+
+    def delete(self, key):
+        with self.lock:
+            if self.data.pop(key, None) is not None:
+                self.dirty = True
+        self.kick()
+
+    def kick(self):
+        """Schedule a background flush"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='store-flush', daemon=True)
+            self.thread.start()
+        self.wake.set()
+
+    def _run(self):
+        while True:
+            self.wake.wait()
+            # Let a burst of puts settle into one write
+            while self.wake.wait(self.delay):
+                self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self.write_lock:
+            for hook in self.hooks:
+                try:
+                    hook()
+                except OSError:
+                    pass
+            with self.lock:
+                if not self.dirty:
+                    return
+                blob = json.dumps(self.data)
+                self.dirty = False
+            tmp = self.path + '.tmp'
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(blob)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+                self.writes += 1
+            except OSError:
+                with self.lock:
+                    self.dirty = True
@@ -0,0 +1,214 @@
+"""
+THE 77 - Leaderboard sync
+Durable outbox of records, uploaded in batches by a background thread
+"""
+
+import hashlib
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from base64 import b64encode
+from urllib.parse import urlsplit
+
+# Results per request
+BATCH = 50
+# Seconds between retries: doubles from BACKOFF[0] up to BACKOFF[1], with jitter
+BACKOFF = (2.0, 300.0)
+
+class Rejected(Exception):
+    """The server refused a batch for good (4xx other than 408/429)"""
+
+class ScoreSync:
+    """Offline-first upload of results to ``endpoint``.
+
+    ``submit`` only appends to memory and wakes two threads: the store's
+    flush thread, which appends the entry as a JSON line to ``path`` (a
+    store hook, like RunHistory), and the upload thread, which POSTs up
+    to ``batch`` queued entries at a time over one kept-alive connection.
+    Acknowledged entries advance the ``sent`` count kept in ``store``;
+    on startup lines past it are queued again, and a fully sent log is
+    truncated. Failures back off exponentially; rejected batches are
+    dropped so one bad entry cannot wedge the queue. Every entry has an
+    id derived from its content, so resubmits are ignored here and a
+    batch sent twice (crash before ``sent`` was saved) can be discarded
+    by the server. Without an endpoint entries just wait in the outbox.
+    """
+
+    def __init__(self, path, store, endpoint=None, batch=BATCH, timeout=10.0):
+        self.path = path
+        self.store = store
+        self.batch = batch
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.pending = []
+        self.queue = []
+        self.ids = set()
+        self.conn = None
+        self.thread = None
+        self.wake = threading.Event()
+        self.halt = threading.Event()
+        self.stats = {'sent': 0, 'batches': 0, 'retries': 0, 'rejected': 0}
+        cfg = store.get('outbox') if store.exists('outbox') else {}
+        self.player = cfg.get('player') or uuid.uuid4().hex
+        self.sent = cfg.get('sent', 0)
+        store.hooks.append(self.flush)
+        self._load()
+        if not cfg:
+            self._save()
+        self.endpoint = None
+        if endpoint:
+            self.connect(endpoint)
+
+    def _load(self):
+        lines = []
+        try:
+            with open(self.path, 'rb') as f:
+                blob = f.read()
+        except OSError:
+            blob = b''
+        end = blob.rfind(b'\n') + 1
+        if end < len(blob):
+            # Drop a line cut short by a crash so later appends start clean
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+        for line in blob[:end].splitlines():
+            try:
+                lines.append(json.loads(line))
+            except ValueError:
+                lines.append(None)
+        if lines and self.sent >= len(lines):
+            # Everything went out: save sent=0 before emptying the log, so
+            # a crash in between re-sends (harmless) rather than skips
+            self.sent = 0
+            self._save()
+            self.store.flush()
+            with open(self.path, 'wb'):
+                pass
+            lines = []
+        self.sent = min(self.sent, len(lines))
+        self.ids = {e['id'] for e in lines if e}
+        # Unreadable lines stay as None so ``sent`` keeps counting lines
+        self.queue = lines[self.sent:]
+
+    def _save(self):
+        self.store.put('outbox', player=self.player, sent=self.sent)
+
+    def connect(self, endpoint):
+        """Upload to ``endpoint`` (http or https URL) from now on"""
+        url = urlsplit(endpoint)
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise ValueError(f"bad leaderboard endpoint {endpoint!r}")
+        self._close()
+        self.endpoint = url
+        if self.thread is None:
+            self.halt.clear()
+            self.thread = threading.Thread(target=self._run, name='score-sync', daemon=True)
+            self.thread.start()
+        self.wake.set()
+
+    def submit(self, total, diff, seconds, replay=None):
+        """Queue one result; False if the same result is already queued"""
+        key = replay or f"{total}_{diff}_{seconds}_{time.time()}".encode()
+        entry = {'id': hashlib.blake2s(key, digest_size=12).hexdigest(),
+                 'size': total, 'diff': diff, 'time': seconds, 'at': int(time.time())}
+        if replay:
+            entry['replay'] = b64encode(replay).decode('ascii')
+        with self.lock:
+            if entry['id'] in self.ids:
+                return False
+            self.ids.add(entry['id'])
+            self.pending.append(json.dumps(entry, separators=(',', ':')))
+            self.queue.append(entry)
+        self.store.kick()
+        self.wake.set()
+        return True
+
+    def __len__(self):
+        """Lines of the outbox not yet acknowledged by the server"""
+        return len(self.queue)
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            lines = self.pending[:]
+            self.pending.clear()
+        blob = ('\n'.join(lines) + '\n').encode('utf-8')
+        try:
+            with open(self.path, 'ab') as f:
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError:
+            # Keep them for the next flush, ahead of anything newer
+            with self.lock:
+                self.pending[:0] = lines
+            raise
+
+    def stop(self):
+        """End the upload thread after the request in flight"""
+        self.halt.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(self.timeout)
+            self.thread = None
+        self._close()
+
+    def _run(self):
+        delay = BACKOFF[0]
+        while not self.halt.is_set():
+            self.wake.wait()
+            self.wake.clear()
+            while self.queue and not self.halt.is_set():
+                lines = self.queue[:self.batch]
+                batch = [e for e in lines if e]
+                try:
+                    if batch:
+                        self._post(batch)
+                except Rejected:
+                    self.stats['rejected'] += len(batch)
+                except (OSError, http.client.HTTPException):
+                    self._close()
+                    self.stats['retries'] += 1
+                    self.halt.wait(delay * random.uniform(0.5, 1.0))
+                    delay = min(delay * 2, BACKOFF[1])
+                    continue
+                else:
+                    self.stats['sent'] += len(batch)
+                    self.stats['batches'] += 1
+                delay = BACKOFF[0]
+                self._ack(len(lines))
+
+    def _ack(self, n):
+        with self.lock:
+            del self.queue[:n]
+            self.sent += n
+        self._save()
+
+    def _post(self, batch):
+        url = self.endpoint
+        if self.conn is None:
+            cls = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+            self.conn = cls(url.hostname, url.port, timeout=self.timeout)
+        body = json.dumps({'player': self.player, 'results': batch}).encode('utf-8')
+        self.conn.request('POST', url.path or '/', body,
+                          {'Content-Type': 'application/json'})
+        resp = self.conn.getresponse()
+        # Read the whole body so the connection can be reused
+        resp.read()
+        if resp.will_close:
+            self._close()
+        if 200 <= resp.status < 300:
+            return
+        if 400 <= resp.status < 500 and resp.status not in (408, 429):
+            raise Rejected(resp.status)
+        raise http.client.HTTPException(f"HTTP {resp.status}")
+
+    def _close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
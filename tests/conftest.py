@@ -0,0 +1,22 @@
+"""
+THE 77 - Test setup
+Headless Kivy and the repository on sys.path; ``data_dir`` for tests that import the app
+"""
+
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Run in ``tmp_path``, where the app opens its data files, and write
+    them out before the working directory is restored"""
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    from common import DB
+    DB.flush()
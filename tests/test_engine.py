@@ -0,0 +1,102 @@
+"""
+THE 77 - Game rule tests
+Tap rules per difficulty, checkpoint and full resets, snapshot and restore
+
+    python -m pytest -q tests
+"""
+
+import pytest
+
+from engine import GameEngine, checkpoint, CLOSED, OPEN, SOLVED, WRONG
+
+def game(total=33, diff='easy', seed=77):
+    e = GameEngine(total, diff, seed)
+    return e, {n: i for i, n in enumerate(e.nums)}
+
+def test_board_is_a_seeded_permutation():
+    e, _ = game(77, seed=5)
+    assert sorted(e.nums) == list(range(1, 78))
+    assert list(GameEngine(77, 'hard', 5).nums) == list(e.nums)
+    assert not any(e.state) and e.next_num == 1
+
+@pytest.mark.parametrize('total, cp', [(10, 3), (33, 3), (55, 5), (77, 7), (1000, 10)])
+def test_checkpoint_size(total, cp):
+    assert checkpoint(total) == cp
+
+def test_easy_wrong_cell_closes_on_next_tap():
+    e, pos = game()
+    assert e.tap(pos[5]) == [(pos[5], WRONG)]
+    assert e.next_num == 1 and e.mistakes == 1
+    assert e.tap(pos[1]) == [(pos[5], CLOSED), (pos[1], SOLVED)]
+    # Its feedback comes after the next tap already closed it
+    assert e.feedback(pos[5]) == []
+    assert e.resets == 0 and e.taps == 2
+
+def test_easy_feedback_closes_wrong_cell():
+    e, pos = game()
+    e.tap(pos[5])
+    assert e.feedback(pos[5]) == [(pos[5], CLOSED)]
+    assert e.wrong == -1
+
+def test_solved_cell_ignores_taps():
+    e, pos = game(diff='hard')
+    e.tap(pos[1])
+    assert e.tap(pos[1]) == []
+    assert e.taps == 1 and e.mistakes == 0
+
+def test_medium_run_solves_at_checkpoint():
+    e, pos = game(diff='medium')
+    assert e.cp == 3
+    assert e.tap(pos[1]) == [(pos[1], OPEN)]
+    assert e.tap(pos[2]) == [(pos[2], OPEN)]
+    # An open cell of the run ignores taps
+    assert e.tap(pos[2]) == []
+    assert e.tap(pos[3]) == [(pos[1], SOLVED), (pos[2], SOLVED), (pos[3], SOLVED)]
+    assert e.next_num == 4 and len(e.run) == 0
+
+def test_medium_wrong_tap_resets_to_checkpoint():
+    e, pos = game(diff='medium')
+    for n in (1, 2, 3, 4, 5):
+        e.tap(pos[n])
+    assert e.tap(pos[9]) == [(pos[9], WRONG)]
+    assert sorted(e.feedback(pos[9])) == sorted([(pos[4], CLOSED), (pos[5], CLOSED),
+                                                 (pos[9], CLOSED)])
+    assert e.next_num == 4 and e.resets == 1
+    assert [e.state[pos[n]] for n in (1, 2, 3, 4, 5, 9)] == [SOLVED] * 3 + [CLOSED] * 3
+
+def test_hard_wrong_tap_resets_everything():
+    e, pos = game(diff='hard')
+    for n in (1, 2, 3):
+        e.tap(pos[n])
+    e.tap(pos[9])
+    assert sorted(e.feedback(pos[9])) == sorted((pos[n], CLOSED) for n in (1, 2, 3, 9))
+    assert not any(e.state) and e.next_num == 1
+    assert (e.taps, e.mistakes, e.resets) == (4, 1, 1)
+
+@pytest.mark.parametrize('diff', ['easy', 'medium', 'hard'])
+def test_win(diff):
+    e, pos = game(diff=diff)
+    for n in range(1, 34):
+        assert not e.won
+        e.tap(pos[n])
+    assert e.won and all(s == SOLVED for s in e.state)
+    assert e.tap(pos[1]) == []
+
+@pytest.mark.parametrize('diff', ['easy', 'medium', 'hard'])
+def test_snapshot_restores_mid_game(diff):
+    e, pos = game(77, diff)
+    for n in (1, 2, 3, 4, 60):
+        e.tap(pos[n])
+    e2 = GameEngine.restore(e.snapshot())
+    for attr in ('total', 'diff', 'cp', 'seed', 'nums', 'state', 'run',
+                 'next_num', 'wrong', 'taps', 'mistakes', 'resets'):
+        assert getattr(e2, attr) == getattr(e, attr), attr
+    # Both carry on alike
+    assert e2.feedback(pos[60]) == e.feedback(pos[60])
+    assert e2.tap(pos[e.next_num]) == e.tap(pos[e.next_num])
+
+def test_restore_rejects_other_bytes():
+    blob = GameEngine(33, 'medium', 1).snapshot()
+    for bad in (b'', blob[:10], blob[:-1], blob + b'\0', b'\2' + blob[1:]):
+        with pytest.raises(ValueError):
+            GameEngine.restore(bad)
@@ -0,0 +1,104 @@
+"""
+THE 77 - Game screen tests
+Wrong-tap holds across pauses and suspends still give replays that verify, headless
+
+    python -m pytest -q tests
+"""
+
+import pytest
+
+from replay import verify
+
+class FakeTime:
+    """Stands in for the game module's ``time``; tests move ``now`` by hand"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def play(data_dir, monkeypatch):
+    import game
+    from engine import GameEngine
+    clock = FakeTime()
+    monkeypatch.setattr(game, 'pytime', clock)
+
+    def start(total=33, diff='medium'):
+        g = game.GameScreen(name='game')
+        g.engine = GameEngine(total, diff, seed=77)
+        g.total = total
+        g.ensure_built()
+        g.new_game()
+        return g, clock
+    return start
+
+def tap(g, clock, num, after=0.1):
+    clock.now += after
+    g._on_cell(list(g.engine.nums).index(num))
+
+def finish(g, clock):
+    while not g.won:
+        tap(g, clock, g.engine.next_num)
+    return verify(g.recorder.blob(), g.total, g.engine.diff, int(g._elapsed()))
+
+def test_pause_during_hold_still_verifies(play):
+    g, clock = play()
+    tap(g, clock, 1)
+    tap(g, clock, 3)
+    assert g.engine.mistakes == 1
+    clock.now += 0.05
+    g.toggle_pause()
+    # The reset fires on the wall clock while the game is paused
+    clock.now += 5
+    g.feedback.fire()
+    clock.now += 0.05
+    g.toggle_pause()
+    # Only 0.15 s of game time since the wrong tap: still held
+    tap(g, clock, 1, after=0.05)
+    assert g.engine.next_num == 1
+    tap(g, clock, 1, after=0.3)
+    assert g.engine.next_num == 2
+    assert finish(g, clock)
+
+def test_suspend_stops_clock_events_and_resume_drops_snapshot(play):
+    from common import DB
+    g, clock = play()
+    assert g.timer is not None
+    # No taps yet: nothing is saved, but the clock still stops
+    g.suspend()
+    assert g.timer is None and g.paused
+    assert DB.load_game() is None
+    g.toggle_pause()
+    tap(g, clock, 1)
+    g.suspend()
+    assert g.timer is None
+    assert DB.load_game() is not None
+    # Back in the same process: the snapshot would now be stale
+    g.toggle_pause()
+    assert g.timer is not None
+    assert DB.load_game() is None
+
+def test_suspend_during_hold_still_verifies(play):
+    from common import DB
+    g, clock = play(diff='hard')
+    tap(g, clock, 1)
+    tap(g, clock, 5)
+    # Queued behind the reset; suspend settles it early and drops this tap
+    tap(g, clock, 1, after=0.05)
+    g.suspend()
+    assert g.feedback.due < 0 and g.engine.next_num == 1
+    snap = DB.load_game()
+    assert snap['held'] == g.held_until
+
+    # Carry on in a new screen from the snapshot, as after a restart
+    g2, _ = play(diff='hard')
+    g2.engine = type(g.engine).restore(g.engine.snapshot())
+    g2._restore(snap)
+    g2.toggle_pause()
+    tap(g2, clock, 1, after=0.05)
+    assert g2.engine.next_num == 1
+    tap(g2, clock, 1, after=0.3)
+    assert g2.engine.next_num == 2
+    assert finish(g2, clock)
@@ -0,0 +1,111 @@
+"""
+THE 77 - Run history tests
+Aggregates, catching up on the log after a restart, and the P-square quantiles
+
+    python -m pytest -q tests
+"""
+
+import json
+import os
+import random
+
+import pytest
+
+from history import RunHistory, P2Quantile, RECORD
+from storage import WriteBehindStore
+
+def open_history(tmp_path):
+    # Writes only happen on the flushes the tests make
+    store = WriteBehindStore(str(tmp_path / 'data.json'), delay=60)
+    return store, RunHistory(str(tmp_path / 'runs.bin'), store)
+
+def play(h, games):
+    for k, (won, seconds) in enumerate(games):
+        h.append(77, 'hard', won, seconds, mistakes=k % 3, resets=k % 2)
+
+GAMES = [(True, 30.0), (False, 4.0), (True, 20.5), (True, 41.0), (False, 9.0), (True, 25.0)]
+
+def test_stats(tmp_path):
+    store, h = open_history(tmp_path)
+    play(h, GAMES)
+    s = h.stats(77, 'hard')
+    assert (s['count'], s['won'], s['abandoned']) == (6, 4, 2)
+    assert s['best'] == 20.5
+    assert s['mean'] == pytest.approx((30 + 20.5 + 41 + 25) / 4)
+    assert s['p50'] == 30.0
+    assert (s['mistakes'], s['resets']) == (0 + 1 + 2 + 0 + 1 + 2, 3)
+    assert h.stats(33, 'easy')['count'] == 0
+    assert len(h) == 6
+
+def test_restart_reads_only_new_records(tmp_path):
+    store, h = open_history(tmp_path)
+    play(h, GAMES[:3])
+    store.flush()
+    # Three more reach the log but the process dies before the stats are saved
+    play(h, GAMES[3:])
+    h.flush()
+    with open(tmp_path / 'data.json') as f:
+        assert json.load(f)['history']['n'] == 3
+    store2, h2 = open_history(tmp_path)
+    assert len(h2) == 6
+    assert h2.stats(77, 'hard') == h.stats(77, 'hard')
+
+def test_restart_drops_torn_record(tmp_path):
+    store, h = open_history(tmp_path)
+    play(h, GAMES)
+    store.flush()
+    with open(h.path, 'ab') as f:
+        f.write(b'\1\2\3')
+    store2, h2 = open_history(tmp_path)
+    assert os.path.getsize(h.path) == 6 * RECORD.size
+    assert len(h2) == 6
+    h2.append(33, 'easy', True, 10.0)
+    h2.flush()
+    assert list(h2.records(6))[0][1:4] == (33, 0, 1)
+
+def test_restart_rebuilds_after_lost_log(tmp_path):
+    store, h = open_history(tmp_path)
+    play(h, GAMES)
+    store.flush()
+    with open(h.path, 'r+b') as f:
+        f.truncate(2 * RECORD.size)
+    store2, h2 = open_history(tmp_path)
+    assert len(h2) == 2
+    s = h2.stats(77, 'hard')
+    assert (s['count'], s['won'], s['best']) == (2, 1, 30.0)
+
+def test_records_slice(tmp_path):
+    store, h = open_history(tmp_path)
+    play(h, GAMES)
+    h.flush()
+    durations = [r[4] for r in h.records(2, 3)]
+    assert durations == [20500, 41000, 9000]
+
+@pytest.mark.parametrize('p', [0.5, 0.9])
+def test_p2_quantile_tracks_exact_value(p):
+    rng = random.Random(77)
+    xs = [rng.lognormvariate(3, 0.5) for _ in range(5000)]
+    est = P2Quantile(p)
+    for x in xs:
+        est.add(x)
+    exact = sorted(xs)[int(p * len(xs))]
+    assert est.value() == pytest.approx(exact, rel=0.03)
+
+def test_p2_quantile_state_round_trip():
+    rng = random.Random(1)
+    a = P2Quantile(0.9)
+    for _ in range(100):
+        a.add(rng.random())
+    b = P2Quantile(0.9, a.state)
+    for _ in range(100):
+        x = rng.random()
+        a.add(x)
+        b.add(x)
+    assert a.value() == b.value()
+
+def test_p2_quantile_few_samples():
+    est = P2Quantile(0.5)
+    assert est.value() is None
+    for x in (3, 1, 2):
+        est.add(x)
+    assert est.value() == 2
@@ -0,0 +1,53 @@
+"""
+THE 77 - Board layout tests
+Grids from layout.solve and layout.scroll fit their box and keep cells near square
+
+    python -m pytest -q tests
+"""
+
+import itertools
+
+import pytest
+
+import layout
+
+SIZES = (1, 7, 33, 55, 77, 100, 200)
+BOXES = ((480, 800), (800, 480), (360, 360), (1080, 2300), (200, 900))
+
+@pytest.mark.parametrize('n, box', list(itertools.product(SIZES, BOXES)))
+def test_solve_fits_every_cell(n, box):
+    w, h = box
+    spacing, inset = 2, 14
+    rows, cols, cw, ch = layout.solve(n, w, h, spacing, inset)
+    assert rows * cols >= n > (rows - 1) * cols
+    assert cw > 0 and ch > 0
+    assert cols * cw + (cols - 1) * spacing + 2 * inset <= w + 1e-6
+    assert rows * ch + (rows - 1) * spacing + 2 * inset <= h + 1e-6
+    assert max(cw, ch) <= min(cw, ch) * layout.GOLDEN + 1e-6
+
+def test_solve_picks_largest_cells():
+    rows, cols, cw, ch = layout.solve(77, 480, 800, 2, 14)
+    best = cw * ch
+    for c in range(1, 78):
+        r = -(-77 // c)
+        w = (480 - 28 - 2 * (c - 1)) / c
+        h = (800 - 28 - 2 * (r - 1)) / r
+        if w > 0 and h > 0:
+            w, h = min(w, h * layout.GOLDEN), min(h, w * layout.GOLDEN)
+            assert w * h <= best + 1e-6
+
+def test_solve_follows_orientation():
+    portrait = layout.solve(77, 480, 800, 2, 14)
+    landscape = layout.solve(77, 800, 480, 2, 14)
+    assert portrait[0] > portrait[1]
+    assert landscape[1] > landscape[0]
+
+def test_solve_when_nothing_fits():
+    assert layout.solve(77, 20, 20, 2, 14) == (1, 77, 0, 0)
+
+def test_scroll_fills_width_with_large_enough_cells():
+    rows, cols, cw, ch = layout.scroll(1000, 480, 2, 14, 40)
+    assert cw == ch >= 40
+    assert cols * cw + (cols - 1) * 2 + 28 == pytest.approx(480)
+    assert rows == -(-1000 // cols)
+    assert layout.scroll(3, 2000, 2, 14, 40)[:2] == (1, 3)
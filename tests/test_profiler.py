@@ -0,0 +1,31 @@
+"""
+THE 77 - Profiler tests
+Taps on a game screen built after the profiler was turned on, headless
+
+    python -m pytest -q tests
+"""
+
+def test_tap_on_screen_built_while_enabled(data_dir):
+    from kivy.clock import Clock
+    from engine import GameEngine
+    from profiler import PROFILER
+    PROFILER.enable()
+    try:
+        from game import GameScreen
+        g = GameScreen(name='game')
+        g.engine = GameEngine(33, 'medium')
+        g.total = 33
+        g.ensure_built()
+        g.new_game()
+        idx = list(g.engine.nums).index(1)
+        g._on_cell(idx)
+        for _ in range(3):
+            Clock.tick()
+        stats = PROFILER.stats()
+    finally:
+        PROFILER.disable()
+    assert g.engine.next_num == 2
+    assert g.board.drawn[idx] == g.engine.state[idx]
+    # The flush trigger was made after enable(), from a patched method
+    assert 'Clock:GameScreen._flush' in stats
+    assert 'GameScreen._on_cell' in stats
@@ -0,0 +1,88 @@
+"""
+THE 77 - Replay tests
+Tap log encoding and the verifier's rules and timing checks
+
+    python -m pytest -q tests
+"""
+
+import pytest
+
+from engine import GameEngine, HOLD
+from replay import Recorder, header, taps, replay, verify, HOLD_MS, MAX_BURST
+
+def record(total, diff, plays, seed=7):
+    """Log of ``plays``, (number, seconds) pairs, on a seeded board"""
+    e = GameEngine(total, diff, seed)
+    pos = {n: i for i, n in enumerate(e.nums)}
+    r = Recorder()
+    r.start(e)
+    for n, t in plays:
+        r.tap(pos[n], t)
+    return r.blob()
+
+def clean(total, start=0.0, first=1, gap=0.05):
+    return [(n, start + k * gap) for k, n in enumerate(range(first, total + 1), 1)]
+
+def test_log_round_trip():
+    r = Recorder()
+    r.start(GameEngine(33, 'medium', 1234))
+    r.tap(5, 0.0)
+    r.tap(7, 0.1234)
+    r.tap(32, 200.0)
+    blob = r.blob()
+    assert header(blob) == (33, 'medium', 1234)
+    assert list(taps(blob)) == [(0, 5), (123, 7), (199877, 32)]
+
+def test_resume_carries_on_the_clock():
+    r = Recorder()
+    r.start(GameEngine(10, 'easy', 1))
+    r.tap(1, 1.0)
+    r2 = Recorder()
+    r2.resume(r.blob())
+    r2.tap(2, 1.5)
+    assert list(taps(r2.blob())) == [(1000, 1), (500, 2)]
+
+@pytest.mark.parametrize('diff', ['easy', 'medium', 'hard'])
+def test_clean_game_verifies(diff):
+    blob = record(33, diff, clean(33))
+    e, t = replay(blob)
+    assert e.won and t == 1650
+    assert verify(blob, 33, diff, 1)
+    assert not verify(blob, 33, diff, 0)
+    assert not verify(blob, 55, diff, 60)
+    assert not verify(blob, 33, 'easy' if diff != 'easy' else 'hard', 60)
+
+def test_unfinished_or_broken_logs_fail():
+    blob = record(33, 'hard', clean(33))
+    assert not verify(record(33, 'hard', clean(32)), 33, 'hard', 60)
+    assert not verify(blob[:-1], 33, 'hard', 60)
+    assert not verify(b'\0' + blob[1:], 33, 'hard', 60)
+    assert not verify(b'', 33, 'hard', 60)
+
+@pytest.mark.parametrize('diff', ['medium', 'hard'])
+def test_tap_inside_hold_fails(diff):
+    wrong = [(1, 0.05), (9, 0.1)]
+    early = record(33, diff, wrong + clean(33, 0.1 + HOLD / 2))
+    with pytest.raises(ValueError, match="reset"):
+        replay(early)
+    late = record(33, diff, wrong + clean(33, 0.1 + HOLD - 0.05))
+    assert verify(late, 33, diff, 60)
+
+def test_easy_has_no_hold():
+    blob = record(33, 'easy', [(1, 0.05), (9, 0.1)] + clean(33, 0.1, first=2))
+    assert verify(blob, 33, 'easy', 60)
+
+def test_taps_too_close_fail():
+    fast = record(33, 'hard', clean(33, gap=0.01))
+    with pytest.raises(ValueError, match="close"):
+        replay(fast)
+    # The first tap may come at once
+    assert verify(record(33, 'hard', clean(33, start=-0.05)), 33, 'hard', 60)
+
+def test_taps_queued_during_a_reset_land_together():
+    held = 0.1 + HOLD_MS / 1000
+    plays = [(1, 0.05), (9, 0.1)] + [(n, held) for n in range(1, MAX_BURST + 2)]
+    assert verify(record(33, 'hard', plays + clean(33, held, first=MAX_BURST + 2)), 33, 'hard', 60)
+    plays = [(1, 0.05), (9, 0.1)] + [(n, held) for n in range(1, MAX_BURST + 3)]
+    with pytest.raises(ValueError, match="close"):
+        replay(record(33, 'hard', plays + clean(33, held, first=MAX_BURST + 3)))
@@ -0,0 +1,160 @@
+"""
+THE 77 - Leaderboard sync tests
+Backoff, restarts, failed outbox writes and duplicate ids, against a local stand-in server
+
+    python -m pytest -q tests
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sync
+from storage import WriteBehindStore
+from sync import ScoreSync
+
+class Leaderboard(ThreadingHTTPServer):
+    """Answers each POST with the next of ``replies`` (200 once they run out)
+    and keeps every result id it accepted, repeats included"""
+
+    daemon_threads = True
+
+    def __init__(self, replies=()):
+        super().__init__(('127.0.0.1', 0), Handler)
+        self.replies = list(replies)
+        self.lock = threading.Lock()
+        self.ids = []
+        self.times = []
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/scores"
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        srv = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with srv.lock:
+            srv.times.append(time.monotonic())
+            status = srv.replies.pop(0) if srv.replies else 200
+            if status == 200:
+                srv.ids += [r['id'] for r in json.loads(body)['results']]
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(replies=()):
+        servers.append(Leaderboard(replies))
+        return servers[-1]
+    yield start
+    for srv in servers:
+        srv.close()
+
+def open_sync(tmp_path, endpoint=None, batch=50):
+    store = WriteBehindStore(str(tmp_path / 'data.json'), delay=0.01)
+    return store, ScoreSync(str(tmp_path / 'outbox.jsonl'), store, endpoint, batch=batch)
+
+def wait_for(cond, timeout=10.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > end:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+def submit(s, n, first=0):
+    return [s.submit(77, 'hard', 60 + k, replay=b'replay %d' % k) for k in range(first, first + n)]
+
+def test_backoff_doubles_on_http_failure(tmp_path, server, monkeypatch):
+    monkeypatch.setattr(sync, 'BACKOFF', (0.05, 0.1))
+    # No jitter, so every wait is the full delay
+    monkeypatch.setattr(sync.random, 'uniform', lambda a, b: b)
+    srv = server([503, 503, 500, 503])
+    store, s = open_sync(tmp_path)
+    submit(s, 3)
+    s.connect(srv.url)
+    wait_for(lambda: len(s) == 0)
+    s.stop()
+    assert s.stats['retries'] == 4
+    assert s.stats['sent'] == 3
+    gaps = [b - a for a, b in zip(srv.times, srv.times[1:])]
+    # 0.05, then doubling up to the 0.1 cap
+    for gap, delay in zip(gaps, (0.05, 0.1, 0.1, 0.1)):
+        assert gap >= delay
+    assert max(gaps) < 0.2
+    assert len(srv.ids) == len(set(srv.ids)) == 3
+
+def test_restart_resumes_partly_sent_outbox(tmp_path, server):
+    # The first batch of two goes through, then the server starts failing
+    srv = server([200] + [503] * 100)
+    store, s = open_sync(tmp_path, batch=2)
+    submit(s, 5)
+    store.flush()
+    s.connect(srv.url)
+    wait_for(lambda: len(s) == 3)
+    s.stop()
+    store.flush()
+
+    srv2 = server()
+    store2, s2 = open_sync(tmp_path, batch=2)
+    assert len(s2) == 3
+    assert s2.sent == 2
+    s2.connect(srv2.url)
+    wait_for(lambda: len(s2) == 0)
+    s2.stop()
+    assert not set(srv.ids) & set(srv2.ids)
+    assert len(srv.ids + srv2.ids) == len(set(srv.ids + srv2.ids)) == 5
+
+def test_failed_write_keeps_entries(tmp_path):
+    store, s = open_sync(tmp_path)
+    # A directory where the outbox should be makes every append fail
+    os.mkdir(s.path)
+    submit(s, 2)
+    with pytest.raises(OSError):
+        s.flush()
+    # The store's own flush swallows the error; the entries must stay queued
+    store.flush()
+    assert len(s.pending) == 2
+    submit(s, 1, first=2)
+    os.rmdir(s.path)
+    store.flush()
+    assert not s.pending
+
+    store2, s2 = open_sync(tmp_path)
+    assert [e['time'] for e in s2.queue] == [60, 61, 62]
+
+def test_resubmits_are_ignored(tmp_path, server):
+    store, s = open_sync(tmp_path)
+    assert submit(s, 3) == [True] * 3
+    assert submit(s, 2) == [False] * 2
+    store.flush()
+
+    # Ids are read back from the outbox, so a restart does not forget them
+    srv = server()
+    store2, s2 = open_sync(tmp_path, srv.url)
+    assert submit(s2, 4) == [False] * 3 + [True]
+    wait_for(lambda: len(s2) == 0)
+    s2.stop()
+    assert sorted(srv.ids) == sorted(set(srv.ids))
+    assert len(srv.ids) == 4
@@ -0,0 +1,57 @@
+"""
+THE 77 - Number textures
+Cell numbers rasterized once per size bucket and shared by every board
+"""
+
+from collections import OrderedDict
+from kivy.core.text import Label as CoreLabel
+
+class NumberTextures:
+    """LRU cache of number textures.
+
+    Textures are grouped in buckets keyed by (quantized font size, bold,
+    text color); a bucket holds the numbers rendered at that style so far.
+    When more than ``capacity`` buckets are alive the least recently used
+    one is dropped. ``misses`` counts rasterizations, ``hits`` reuses.
+    """
+
+    def __init__(self, capacity=4, step=2):
+        self.capacity = capacity
+        self.step = step
+        self.buckets = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize(self, font_size):
+        return max(self.step, int(round(font_size / self.step)) * self.step)
+
+    def bucket(self, font_size, bold=True, color=(1, 1, 1, 1)):
+        """Return the num->texture dict for a style, marking it most recent"""
+        key = (self.quantize(font_size), bool(bold), tuple(color))
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = {}
+            while len(self.buckets) > self.capacity:
+                self.buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.buckets.move_to_end(key)
+        return key, bucket
+
+    def get(self, num, font_size, bold=True, color=(1, 1, 1, 1)):
+        key, bucket = self.bucket(font_size, bold, color)
+        tex = bucket.get(num)
+        if tex is None:
+            self.misses += 1
+            lbl = CoreLabel(text=str(num), font_size=key[0], bold=key[1], color=key[2])
+            lbl.refresh()
+            tex = bucket[num] = lbl.texture
+        else:
+            self.hits += 1
+        return tex
+
+    def clear(self):
+        self.buckets.clear()
+
+TEXTURES = NumberTextures()
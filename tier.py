@@ -0,0 +1,126 @@
+"""
+THE 77 - Device tiers
+Quality settings picked per device by a short calibration on first launch
+"""
+
+import platform
+import statistics
+import time
+
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.event import EventDispatcher
+from kivy.graphics import Fbo, ClearColor, ClearBuffers
+from kivy.logger import Logger
+from kivy.properties import BooleanProperty, NumericProperty, OptionProperty
+
+TIERS = ('low', 'mid', 'high')
+# rounded: board background corners; transition: slide seconds, 0 for a cut;
+# animate: cell animations; fps: main-loop wakeups per second while active
+PROFILES = {
+    'low': {'rounded': False, 'transition': 0.0, 'animate': False, 'fps': 30},
+    'mid': {'rounded': True, 'transition': 0.15, 'animate': True, 'fps': 45},
+    'high': {'rounded': True, 'transition': 0.2, 'animate': True, 'fps': 60},
+}
+# Highest median (frame ms, layout ms) each tier above low accepts
+LIMITS = {'high': (6.0, 4.0), 'mid': (16.0, 12.0)}
+# The calibration draws a board of SIZE cells, once per frame for FRAMES frames
+SIZE = 77
+FRAMES = 12
+
+def rate(frame_ms, layout_ms, machine=None):
+    """Tier for measured median frame and layout times"""
+    tier = 'low'
+    for name in ('high', 'mid'):
+        f, l = LIMITS[name]
+        if frame_ms <= f and layout_ms <= l:
+            tier = name
+            break
+    # armeabi-v7a builds (armv7l, or armv8l on a 64-bit CPU) never rate high
+    machine = (machine or platform.machine()).lower()
+    if tier == 'high' and machine.startswith('arm') and not machine.startswith('arm64'):
+        tier = 'mid'
+    return tier
+
+class DeviceTier(EventDispatcher):
+    """Quality settings in use.
+
+    Setting ``name`` copies its PROFILES entry into the other properties.
+    The app applies ``transition`` and ``fps``, boards check ``animate``
+    on every change and read ``rounded`` when they are built, so corners
+    follow a new tier on boards made afterwards.
+    """
+    name = OptionProperty('mid', options=TIERS)
+    rounded = BooleanProperty(True)
+    transition = NumericProperty(0.15)
+    animate = BooleanProperty(True)
+    fps = NumericProperty(45)
+
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.on_name()
+
+    def on_name(self, *args):
+        for key, value in PROFILES[self.name].items():
+            setattr(self, key, value)
+
+TIER = DeviceTier()
+
+# ============== CALIBRATION ==============
+class Calibration:
+    """Times a SIZE-cell GridBoard on this device.
+
+    Each frame the board is reshaped and resized between its portrait and
+    landscape grids (layout), then drawn into an offscreen Fbo whose
+    pixels are read back, so the time includes the GPU finishing (frame).
+    One sample of each per frame keeps the screen responsive meanwhile.
+    The first sample pays for shaders and textures and is dropped; the
+    medians of the rest go to ``done(tier, frame_ms, layout_ms)``.
+    """
+
+    def __init__(self, done):
+        self.done = done
+        self.frame = []
+        self.layout = []
+        self.event = None
+
+    def start(self):
+        from board import GridBoard
+        from common import C
+        from engine import CLOSED, OPEN, SOLVED, WRONG
+        import layout
+        w, h = Window.size
+        self.shapes = [layout.solve(SIZE, a, b, 2, 14) for a, b in ((w, h), (h, w))]
+        self.board = GridBoard()
+        self.board.set_colors(C('grid'), C('tw'), {CLOSED: C('cell'), OPEN: C('correct'),
+                                                   SOLVED: C('solved'), WRONG: C('wrong')})
+        self.board.show(list(range(1, SIZE + 1)))
+        self.fbo = Fbo(size=Window.size)
+        with self.fbo:
+            ClearColor(0, 0, 0, 0)
+            ClearBuffers()
+        self.fbo.add(self.board.canvas)
+        self.event = Clock.schedule_interval(self._sample, 0)
+
+    def _sample(self, dt):
+        rows, cols, cell_w, cell_h = self.shapes[len(self.frame) % 2]
+        t = time.perf_counter()
+        self.board.reshape(rows, cols)
+        self.board.resize(cell_w, cell_h)
+        t1 = time.perf_counter()
+        self.fbo.ask_update()
+        self.fbo.draw()
+        self.fbo.pixels
+        self.layout.append((t1 - t) * 1000)
+        self.frame.append((time.perf_counter() - t1) * 1000)
+        if len(self.frame) <= FRAMES:
+            return
+        self.event.cancel()
+        self.fbo.remove(self.board.canvas)
+        self.board = self.fbo = None
+        frame_ms = statistics.median(self.frame[1:])
+        layout_ms = statistics.median(self.layout[1:])
+        tier = rate(frame_ms, layout_ms)
+        Logger.info(f"Tier: {tier} (frame {frame_ms:.1f} ms, layout {layout_ms:.1f} ms "
+                    f"on {platform.machine()})")
+        self.done(tier, frame_ms, layout_ms)
@@ -0,0 +1,279 @@
+"""
+THE 77 - Headless benchmark suite
+Runs The77App in an offscreen window and times the board lifecycle
+
+    python tools/bench.py [-o bench.json] [--baseline old.json] [--tolerance 0.25]
+                          [--tier high]
+
+For every board (33/55/77, plus 1000 on the scrolling board) and
+difficulty it measures new_game, taps through _on_cell (correct, wrong,
+and the reset a wrong tap triggers),
+_on_container_resize / _rebuild_grid when rotating, one animation step
+with every cell flipping (boards that animate), and the frame-time
+distribution while a script solves the board one tap per frame. The
+versus screen is timed the same way with both players touching their
+33/55/77 board in every frame. With
+--baseline the p50 of every metric is compared and the exit status is 1
+if any got slower by more than the tolerance. The app runs at --tier
+rather than calibrating, so runs on one machine stay comparable.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+CWD = os.getcwd()
+# Keep the app's data and history files out of the way
+os.chdir(tempfile.mkdtemp(prefix='the77-bench-'))
+
+from kivy.config import Config
+Config.set('graphics', 'maxfps', '0')
+
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.uix.screenmanager import NoTransition
+from kivy.tests.common import UnitTestTouch
+import main
+from common import DB
+from engine import CLOSED, OPEN
+from tier import TIERS
+
+BOARDS = (33, 55, 77, 1000)
+DIFFS = ('easy', 'medium', 'hard')
+PORTRAIT, LANDSCAPE = (480, 854), (854, 480)
+now = time.perf_counter
+
+def summary(samples):
+    """p50/p90/p99/mean/max in ms for a list of seconds"""
+    if not samples:
+        return None
+    xs = sorted(s * 1000 for s in samples)
+    pick = lambda p: xs[min(len(xs) - 1, int(p * len(xs)))]
+    return {'n': len(xs), 'p50': pick(0.5), 'p90': pick(0.9), 'p99': pick(0.99),
+            'mean': sum(xs) / len(xs), 'max': xs[-1]}
+
+def timed(fn, *args):
+    t = now()
+    fn(*args)
+    return now() - t
+
+class Bench:
+    def __init__(self, app, rounds):
+        self.app = app
+        self.rounds = rounds
+        self.results = {}
+        self.script = self.run()
+
+    def step(self, dt):
+        try:
+            wait = next(self.script)
+        except StopIteration:
+            self.app.stop()
+            return
+        Clock.schedule_once(self.step, wait)
+
+    def tap(self, g, idx):
+        """Tap through the screen and render the batch synchronously"""
+        g._on_cell(idx)
+        g._flush()
+
+    def run(self):
+        app = self.app
+        app.sm.transition = NoTransition()
+        yield 0.2
+        for total in BOARDS:
+            for diff in DIFFS:
+                app.gtotal, app.gdiff = total, diff
+                app.goto('menu')
+                yield 0.05
+                app.goto('game')
+                Window.size = PORTRAIT
+                yield 0.3
+                g = app.screen('game')
+                r = self.results[f"{total}/{diff}"] = {}
+                yield from self.frames(g, r)
+                self.taps(g, r)
+                self.animate(g, r)
+                yield from self.resize(g, r)
+                r['new_game'] = summary([timed(g.new_game) for _ in range(self.rounds)])
+                yield 0.05
+                print(f"{total}/{diff}: new_game p50 {r['new_game']['p50']:.2f} ms, "
+                      f"tap p50 {r['tap_correct']['p50']:.3f} ms, "
+                      f"frame p99 {r['solve_frames']['p99']:.2f} ms", file=sys.stderr)
+        app.gversus = True
+        for total in BOARDS:
+            if total > 77:
+                continue
+            for diff in DIFFS:
+                app.gtotal, app.gdiff = total, diff
+                app.goto('menu')
+                yield 0.05
+                app.goto('versus')
+                Window.size = LANDSCAPE
+                yield 0.3
+                r = self.results[f"versus {total}/{diff}"] = {}
+                yield from self.versus(app.screen('versus'), r)
+                print(f"versus {total}/{diff}: frame p50 {r['solve_frames']['p50']:.2f} ms, "
+                      f"p99 {r['solve_frames']['p99']:.2f} ms", file=sys.stderr)
+        app.gversus = False
+
+    def frames(self, g, r):
+        """Frame-time distribution while solving one tap per frame"""
+        g.new_game()
+        yield 0.1
+        e = g.engine
+        pos = {n: i for i, n in enumerate(e.nums)}
+        times = []
+        last = now()
+        while not e.won:
+            g._on_cell(pos[e.next_num])
+            yield 0
+            t = now()
+            times.append(t - last)
+            last = t
+        r['solve_frames'] = summary(times)
+
+    def versus(self, v, r):
+        """Frame times while both players touch their next cell every frame"""
+        v.new_game()
+        yield 0.1
+        pos = {n: i for i, n in enumerate(v.players[0].engine.nums)}
+        times = []
+        last = now()
+        # Both sides solve in ``total`` frames; the cap keeps a missed touch from hanging
+        for _ in range(v.total * 4):
+            if v.over:
+                break
+            touches = []
+            for p in v.players:
+                b = p.board
+                x, y = b._cell_pos(pos[p.engine.next_num])
+                touches.append(UnitTestTouch(x + b.cell_w / 2, y + b.cell_h / 2))
+            for t in touches:
+                t.touch_down()
+            for t in touches:
+                t.touch_up()
+            yield 0
+            t = now()
+            times.append(t - last)
+            last = t
+        r['solve_frames'] = summary(times)
+
+    def taps(self, g, r):
+        correct, wrong, reset = [], [], []
+        for _ in range(self.rounds):
+            g.new_game()
+            e = g.engine
+            pos = {n: i for i, n in enumerate(e.nums)}
+            half = e.total // 2
+            while e.next_num <= half:
+                correct.append(timed(self.tap, g, pos[e.next_num]))
+            # Wrong tap on a closed cell, then the reset it schedules
+            idx = pos[e.total]
+            wrong.append(timed(self.tap, g, idx))
+            t = now()
+            g.feedback.fire()
+            g._flush()
+            reset.append(now() - t)
+        r['tap_correct'] = summary(correct)
+        r['tap_wrong'] = summary(wrong)
+        r['tap_wrong_reset'] = summary(reset)
+
+    def animate(self, g, r):
+        """Animation step cost with every cell flipping open, then closed"""
+        b = g.board
+        if not hasattr(b, 'anim'):
+            return
+        g.new_game()
+        steps = []
+        for state in (OPEN, CLOSED):
+            for i in range(b.n):
+                b.set_cell(i, state)
+            # Step at 60 fps timestamps until every flip has ended
+            t0, k = Clock.get_time(), 0
+            while len(b.anim):
+                k += 1
+                steps.append(timed(b.anim.step, None, t0 + k / 60))
+        r['anim_step'] = summary(steps)
+
+    def resize(self, g, r):
+        cold, warm, rebuild = [], [], []
+        for i in range(self.rounds):
+            Window.size = LANDSCAPE if i % 2 == 0 else PORTRAIT
+            yield 0.05
+            g.last_layout = None
+            g.layout_cache.clear()
+            cold.append(timed(g._on_container_resize, None, None))
+            warm.append(timed(g._on_container_resize, None, None))
+            rows, cols = g.current_rows, g.current_cols
+            rebuild.append(timed(g._rebuild_grid, cols, rows))
+            g._rebuild_grid(rows, cols)
+        Window.size = PORTRAIT
+        r['resize'] = summary(cold)
+        r['resize_cached'] = summary(warm)
+        r['rebuild_grid'] = summary(rebuild)
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for key, metrics in results.items():
+        for name, cur in metrics.items():
+            old = baseline.get('results', {}).get(key, {}).get(name)
+            if cur and old and old['p50'] > 0:
+                ratio = cur['p50'] / old['p50']
+                cur['baseline_p50'] = old['p50']
+                cur['ratio'] = ratio
+                if ratio > 1 + tolerance:
+                    regressions.append(f"{key} {name}: {old['p50']:.3f} -> {cur['p50']:.3f} ms "
+                                       f"({ratio:.2f}x)")
+    return regressions
+
+def main_():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-o', '--output', default='bench.json')
+    ap.add_argument('--baseline')
+    ap.add_argument('--tolerance', type=float, default=0.25)
+    ap.add_argument('--rounds', type=int, default=10)
+    ap.add_argument('--board', choices=('canvas', 'buttons'))
+    ap.add_argument('--tier', choices=TIERS, default='high',
+                    help="device tier to run at instead of calibrating")
+    args = ap.parse_args()
+    output = os.path.join(CWD, args.output)
+
+    if args.board:
+        import game
+        game.BOARD = args.board
+
+    DB.save_device(tier=args.tier)
+    app = main.The77App()
+    bench = Bench(app, args.rounds)
+    Clock.schedule_once(bench.step, 0.5)
+    app.run()
+
+    import game
+    out = {'meta': {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                    'machine': platform.machine(), 'board': game.BOARD, 'tier': args.tier,
+                    'rounds': args.rounds, 'startup': app.startup},
+           'results': bench.results}
+    status = 0
+    if args.baseline:
+        with open(os.path.join(CWD, args.baseline)) as f:
+            regressions = compare(bench.results, json.load(f), args.tolerance)
+        out['regressions'] = regressions
+        for line in regressions:
+            print('REGRESSION', line, file=sys.stderr)
+        status = 1 if regressions else 0
+    with open(output, 'w') as f:
+        json.dump(out, f, indent=1)
+    print(f"wrote {output}", file=sys.stderr)
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main_())
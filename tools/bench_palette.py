@@ -0,0 +1,47 @@
+"""
+THE 77 - Palette micro-benchmark
+Compares per-call hex parsing / nested lookups with the compiled PALETTE
+
+    python tools/bench_palette.py [-n 200000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kivy.utils import get_color_from_hex
+from palette import COLORS, TEXTS, PALETTE
+
+THEME = "light"
+LANG = "TR"
+
+def old_C(k): return get_color_from_hex(COLORS[THEME][k])
+def old_T(k): return TEXTS.get(LANG, TEXTS["EN"]).get(k, k)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('-n', type=int, default=200000)
+    n = ap.parse_args().n
+    C, T = PALETTE.c, PALETTE.t
+    cases = [
+        ("C('cell')", lambda: old_C('cell'), lambda: C('cell')),
+        ("T('time')", lambda: old_T('time'), lambda: T('time')),
+        ("board colors", lambda: [old_C(k) for k in ('cell', 'correct', 'solved', 'wrong')],
+                         lambda: [C(k) for k in ('cell', 'correct', 'solved', 'wrong')]),
+    ]
+    print(f"{'case':<14}{'old ns':>10}{'new ns':>10}{'speedup':>10}")
+    for name, old, new in cases:
+        t_old = min(timeit.repeat(old, number=n, repeat=3)) / n * 1e9
+        t_new = min(timeit.repeat(new, number=n, repeat=3)) / n * 1e9
+        print(f"{name:<14}{t_old:>10.0f}{t_new:>10.0f}{t_old / t_new:>9.1f}x")
+
+    t = min(timeit.repeat(lambda: setattr(PALETTE, 'theme', 'dark' if PALETTE.theme == 'light'
+                                          else 'light'), number=1000, repeat=3)) / 1000 * 1e6
+    print(f"theme switch (cached compile): {t:.1f} us")
+
+if __name__ == '__main__':
+    main()
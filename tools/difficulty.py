@@ -0,0 +1,246 @@
+"""
+THE 77 - Difficulty analyzer
+Monte Carlo model of easy / medium / hard play under player-memory models
+
+    python tools/difficulty.py [--games 1000000] [--sizes 33,55,77] [--diffs medium]
+                               [--cp 3,5,7] [--memory good] [--workers N] [-o out.json]
+
+The simulated player taps the next number if they remember where it is,
+otherwise a random closed cell they have no memory of. A wrong tap shows
+its number, which they remember with probability ``learn``; every reset
+makes them forget each remembered cell that closed with probability
+``forget``. Because unseen cells are interchangeable, a game only needs
+which numbers are remembered, so whole batches of games advance one tap
+per step as NumPy arrays; batches run on a process pool.
+
+For every (board size, difficulty, checkpoint size, memory model) it
+prints the mean taps, mistakes and resets and the play-time
+distribution. --check plays a few hundred games through GameEngine
+with the same player and compares the means, to keep the model honest.
+Needs NumPy (not an app dependency).
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine import GameEngine, WRONG, HOLD, checkpoint
+
+# (learn, forget)
+MEMORY = {'perfect': (1.0, 0.0), 'good': (0.9, 0.02), 'average': (0.7, 0.05), 'poor': (0.4, 0.15)}
+DIFFS = ('easy', 'medium', 'hard')
+FEEDBACK = HOLD
+# Games still running after this many taps per cell count as given up
+GIVE_UP = 100
+# Cells per batch row times rows, to bound the batch arrays
+BATCH_CELLS = 8_000_000
+
+def simulate(total, diff, cp, learn, forget, games, seed, tap_known=0.4, tap_search=0.9,
+             max_taps=None):
+    """Play ``games`` games at once; returns (taps, mistakes, resets, seconds, finished)"""
+    rng = np.random.default_rng(seed)
+    max_taps = max_taps or GIVE_UP * total
+    nums = np.arange(total + 1)
+    forget_b = round(forget * (1 << 16))
+    out = [np.zeros(games, np.int32), np.zeros(games, np.int32), np.zeros(games, np.int32),
+           np.zeros(games, np.float32), np.zeros(games, bool)]
+    # State of the games still running; finished ones are written to ``out``
+    ids = np.arange(games)
+    known = np.zeros((games, total + 1), bool)
+    nxt = np.ones(games, np.int64)
+    taps = np.zeros(games, np.int32)
+    mistakes = np.zeros(games, np.int32)
+    resets = np.zeros(games, np.int32)
+    secs = np.zeros(games)
+    idle = 0
+    for _ in range(max_taps):
+        n = ids.size
+        rows = np.arange(n)
+        k = nxt
+        j = k.copy()
+        # Players who do not remember k tap a closed cell they have no memory of
+        search = np.flatnonzero(~known[rows, k])
+        s, ks = search, k[search]
+        for _ in range(3):
+            # Uniform over unremembered cells >= k by rejection, then exactly
+            cand = rng.integers(ks, total + 1)
+            ok = ~known[s, cand]
+            j[s[ok]] = cand[ok]
+            s, ks = s[~ok], ks[~ok]
+            if not s.size:
+                break
+        if s.size:
+            unk = ~known[s] & (nums >= ks[:, None])
+            r = (rng.random(s.size) * unk.sum(1)).astype(np.int64)
+            j[s] = (np.cumsum(unk, 1) > r[:, None]).argmax(1)
+        hit = j == k
+        taps += 1
+        secs += np.where(hit, 0, FEEDBACK)
+        secs[search] += tap_search - tap_known
+        secs += tap_known
+
+        known[rows[hit], k[hit]] = True
+        nxt[hit] += 1
+
+        m = np.flatnonzero(~hit)
+        learned = m[rng.random(m.size) < learn]
+        known[learned, j[learned]] = True
+        mistakes[m] += 1
+        if diff != 'easy' and m.size:
+            # Same arithmetic as GameEngine._reset_cp / _reset_all
+            km = k[m]
+            start = (km - 1) // cp * cp + 1 if diff == 'medium' else np.ones_like(km)
+            nxt[m] = start
+            resets[m] += 1
+            if forget:
+                # 16-bit draws are plenty for a forget probability
+                drop = rng.integers(0, 1 << 16, (m.size, total + 1), np.uint16) < forget_b
+                known[m] &= ~(drop & (nums >= start[:, None]))
+
+        done = nxt > total
+        if done.any():
+            fresh = done & (ids >= 0)
+            d = ids[fresh]
+            for o, v in zip(out, (taps, mistakes, resets, secs)):
+                o[d] = v[fresh]
+            out[4][d] = True
+            # Finished games idle on their last cell until enough pile up to compact
+            nxt[done] = total
+            ids[fresh] = -1
+            idle += d.size
+            if idle * 8 > ids.size:
+                keep = ids >= 0
+                ids, known, nxt = ids[keep], known[keep], nxt[keep]
+                taps, mistakes, resets, secs = taps[keep], mistakes[keep], resets[keep], secs[keep]
+                idle = 0
+                if not ids.size:
+                    break
+    keep = ids >= 0
+    for o, v in zip(out, (taps, mistakes, resets, secs)):
+        o[ids[keep]] = v[keep]
+    return tuple(out)
+
+def play_engine(total, diff, cp, learn, forget, rng, tap_known=0.4, tap_search=0.9):
+    """The same player against GameEngine, one game; returns (taps, mistakes, resets, secs)"""
+    e = GameEngine(total, diff, rng.getrandbits(32))
+    e.cp = cp if diff == 'medium' else 1
+    pos = {n: i for i, n in enumerate(e.nums)}
+    known = set()
+    secs = 0.0
+    while not e.won and e.taps < GIVE_UP * total:
+        k = e.next_num
+        if k in known:
+            j = k
+            secs += tap_known
+        else:
+            j = rng.choice([n for n in range(k, total + 1) if n not in known])
+            secs += tap_search
+        d = e.tap(pos[j])
+        if d and d[-1][1] == WRONG:
+            secs += FEEDBACK
+            if rng.random() < learn:
+                known.add(j)
+            e.feedback(pos[j])
+            if diff != 'easy':
+                start = e.next_num
+                known = {n for n in known if n < start or rng.random() >= forget}
+        else:
+            known.add(k)
+    return e.taps, e.mistakes, e.resets, secs
+
+def configs(args):
+    for total in args.sizes:
+        for diff in args.diffs:
+            cps = (args.cp or [checkpoint(total)]) if diff == 'medium' else [1]
+            for cp in cps:
+                for mem in args.memory:
+                    yield total, diff, cp, mem
+
+def summarize(parts):
+    taps, mistakes, resets, secs, finished = (np.concatenate(x) for x in zip(*parts))
+    done = secs[finished]
+    q = np.percentile(done, (10, 50, 90, 99)) if done.size else [float('nan')] * 4
+    return {'games': int(taps.size), 'unfinished': float(1 - finished.mean()),
+            'taps': float(taps[finished].mean()) if done.size else None,
+            'mistakes': float(mistakes[finished].mean()) if done.size else None,
+            'resets': float(resets[finished].mean()) if done.size else None,
+            'time_p10': float(q[0]), 'time_p50': float(q[1]),
+            'time_p90': float(q[2]), 'time_p99': float(q[3])}
+
+def run(args):
+    seeds = np.random.SeedSequence(args.seed)
+    results = []
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        jobs = []
+        for total, diff, cp, mem in configs(args):
+            learn, forget = MEMORY[mem]
+            batch = max(1000, BATCH_CELLS // (total + 1))
+            futs = [pool.submit(simulate, total, diff, cp, learn, forget, min(batch, args.games - n),
+                                child, args.tap_known, args.tap_search)
+                    for n, child in zip(range(0, args.games, batch),
+                                        seeds.spawn(-(-args.games // batch)))]
+            jobs.append(((total, diff, cp, mem), futs))
+        print(f"{'size':>5} {'diff':<7}{'cp':>3} {'memory':<8}{'taps':>8}{'miss':>8}{'resets':>7}"
+              f"{'p10':>8}{'p50':>8}{'p90':>8}{'p99':>8}{'gaveup':>7}")
+        for (total, diff, cp, mem), futs in jobs:
+            s = summarize([f.result() for f in futs])
+            s.update(size=total, diff=diff, cp=cp, memory=mem)
+            results.append(s)
+            print(f"{total:>5} {diff:<7}{cp if diff == 'medium' else '-':>3} {mem:<8}"
+                  f"{s['taps'] or 0:>8.1f}{s['mistakes'] or 0:>8.1f}{s['resets'] or 0:>7.1f}"
+                  f"{s['time_p10']:>8.0f}{s['time_p50']:>8.0f}{s['time_p90']:>8.0f}"
+                  f"{s['time_p99']:>8.0f}{s['unfinished']:>7.1%}", flush=True)
+    dt = time.perf_counter() - t0
+    games = sum(r['games'] for r in results)
+    print(f"{games} games in {dt:.1f} s ({games / dt:.0f}/s)", file=sys.stderr)
+    return results
+
+def check(args, games=500):
+    """Compare the vectorized model with GameEngine-driven play"""
+    rng = random.Random(args.seed)
+    for total, diff, cp, mem in configs(args):
+        learn, forget = MEMORY[mem]
+        ref = np.array([play_engine(total, diff, cp, learn, forget, rng,
+                                    args.tap_known, args.tap_search) for _ in range(games)])
+        taps, mistakes, resets, secs, fin = simulate(total, diff, cp, learn, forget, games,
+                                                     args.seed, args.tap_known, args.tap_search)
+        print(f"{total:>5} {diff:<7}{cp:>3} {mem:<8} taps engine {ref[:, 0].mean():8.1f} "
+              f"model {taps.mean():8.1f}   time engine {ref[:, 3].mean():7.1f} "
+              f"model {secs.mean():7.1f}", flush=True)
+
+def main():
+    ints = lambda s: [int(x) for x in s.split(',')]
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--games', type=int, default=100_000, help="games per configuration")
+    ap.add_argument('--sizes', type=ints, default=[33, 55, 77])
+    ap.add_argument('--diffs', type=lambda s: s.split(','), default=list(DIFFS))
+    ap.add_argument('--cp', type=ints, help="medium checkpoint sizes (default: the game's)")
+    ap.add_argument('--memory', type=lambda s: s.split(','), default=['good'],
+                    help=f"any of {', '.join(MEMORY)}")
+    ap.add_argument('--tap-known', type=float, default=0.4, help="seconds per remembered tap")
+    ap.add_argument('--tap-search', type=float, default=0.9, help="seconds per searching tap")
+    ap.add_argument('--workers', type=int)
+    ap.add_argument('--seed', type=int, default=77)
+    ap.add_argument('--check', action='store_true')
+    ap.add_argument('-o', '--output')
+    args = ap.parse_args()
+    if args.check:
+        check(args)
+        return 0
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': {k: v for k, v in vars(args).items()}, 'results': results},
+                      f, indent=1)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+THE 77 - Game server load test
+Plays thousands of concurrent sessions against server.py on localhost
+
+    python tools/server_load.py [--sessions 2000] [--connections 50]
+                                [--size 77] [--diff medium] [--gap 50]
+                                [--miss 0.05] [--port PORT] [--results FILE]
+
+Without --port a server is started on a free port and stopped at the
+end. Sessions are spread over --connections connections, each command
+pipelined behind the others on its connection. Every session plays
+like a player with perfect memory: it only learns numbers from the
+cells the server reveals, taps the next number if it has seen it and a
+cell it has not seen otherwise (or, --miss of the time, any cell),
+every --gap ms until it wins, or gives up after 20 taps per cell. On
+medium and hard it waits out the hold after a wrong tap, as the server
+refuses taps until then.
+Reports taps per second, tap round-trip percentiles, errors by reason
+and the server's counters.
+"""
+
+import argparse
+import asyncio
+import collections
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from engine import HOLD
+
+now = time.perf_counter
+
+class Connection:
+    """Pipelined commands on one connection; replies come back in order"""
+
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+        self.waiting = collections.deque()
+        self.task = asyncio.create_task(self._read())
+
+    async def call(self, line):
+        fut = asyncio.get_running_loop().create_future()
+        self.waiting.append(fut)
+        self.writer.write(line.encode('ascii') + b'\n')
+        return (await fut).split()
+
+    async def _read(self):
+        while self.waiting or not self.writer.is_closing():
+            line = await self.reader.readline()
+            if not line:
+                break
+            self.waiting.popleft().set_result(line.decode('ascii'))
+        for fut in self.waiting:
+            fut.set_exception(ConnectionError("server closed the connection"))
+
+    async def close(self):
+        self.writer.close()
+        self.task.cancel()
+
+async def player(conn, args, rng, out):
+    """One session from NEW to WIN (or END when it gives up)"""
+    reply = await conn.call(f"NEW {args.size} {args.diff}")
+    if reply[0] != 'NEW':
+        out['errors'][reply[-1]] += 1
+        return
+    sid = reply[1]
+    # number -> cell for every number revealed so far, and the cells not yet seen
+    seen = {}
+    known = set()
+    unseen = list(range(args.size))
+    rng.shuffle(unseen)
+    next_num = 1
+    # Hard boards with misses may never be solved; give up after this many taps
+    budget = args.size * 20
+    # Spread the first taps over one gap so sessions do not tap in lockstep
+    await asyncio.sleep(rng.uniform(0, args.gap))
+    for _ in range(budget):
+        if rng.random() < args.miss:
+            idx = rng.randrange(args.size)
+        elif next_num in seen:
+            idx = seen[next_num]
+        else:
+            while unseen[-1] in known:
+                unseen.pop()
+            idx = unseen[-1]
+        t = now()
+        reply = await conn.call(f"TAP {sid} {idx}")
+        out['latency'].append(now() - t)
+        wrong = False
+        if reply[0] in ('TAP', 'WIN') and reply[-1] != '-':
+            for cell in reply[-1].split(','):
+                f = cell.split(':')
+                if len(f) == 3:
+                    seen[int(f[2])] = int(f[0])
+                    known.add(int(f[0]))
+                    wrong |= f[1] == '3'
+        if reply[0] == 'WIN':
+            out['wins'] += 1
+            return
+        if reply[0] == 'TAP':
+            next_num = int(reply[2])
+        else:
+            out['errors'][reply[-1]] += 1
+            if reply[-1] == 'unknown-session':
+                return
+        await asyncio.sleep(max(args.gap, HOLD if wrong and args.diff != 'easy' else 0))
+    await conn.call(f"END {sid}")
+    out['gave_up'] += 1
+
+async def start_server(results):
+    extra = ['--results', results] if results else []
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.join(ROOT, 'server.py'), '--port', '0', *extra,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    line = (await proc.stdout.readline()).decode()
+    if not line.startswith('PORT '):
+        raise SystemExit(f"server did not start: {line!r}")
+    return proc, int(line.split()[1])
+
+def pct(xs, p):
+    return xs[min(len(xs) - 1, int(p * len(xs)))] * 1000
+
+async def run(args):
+    proc = None
+    port = args.port
+    if not port:
+        proc, port = await start_server(args.results)
+    conns = []
+    for _ in range(args.connections):
+        conns.append(Connection(*await asyncio.open_connection('127.0.0.1', port)))
+    out = {'latency': [], 'wins': 0, 'gave_up': 0, 'errors': collections.Counter()}
+    rng = random.Random(77)
+    t = now()
+    await asyncio.gather(*(player(conns[i % len(conns)], args,
+                                  random.Random(rng.getrandbits(32)), out)
+                           for i in range(args.sessions)))
+    dt = now() - t
+    stats = await conns[0].call("STATS")
+    for c in conns:
+        await c.close()
+    if proc:
+        proc.terminate()
+        await proc.wait()
+
+    lat = sorted(out['latency'])
+    print(f"{args.sessions} sessions of {args.size}/{args.diff} over {args.connections} "
+          f"connections: {out['wins']} won, {out['gave_up']} gave up in {dt:.1f} s")
+    print(f"{len(lat)} taps, {len(lat) / dt:.0f} taps/s; round trip p50 {pct(lat, 0.5):.2f} ms, "
+          f"p90 {pct(lat, 0.9):.2f} ms, p99 {pct(lat, 0.99):.2f} ms, max {lat[-1] * 1000:.2f} ms")
+    print(f"errors: {dict(out['errors']) or 'none'}")
+    print(f"server: {stats[1]} open sessions, {stats[2]} taps, {stats[3]} wins, "
+          f"{stats[4]} refused, peak RSS {int(stats[5]) / 1024:.0f} MiB, "
+          f"{int(stats[6]) * 1000 / max(1, int(stats[2])):.0f} us CPU per tap")
+    return 0 if out['wins'] + out['gave_up'] == args.sessions else 1
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sessions', type=int, default=2000)
+    ap.add_argument('--connections', type=int, default=50)
+    ap.add_argument('--size', type=int, default=77)
+    ap.add_argument('--diff', default='medium', choices=('easy', 'medium', 'hard'))
+    ap.add_argument('--gap', type=float, default=50, help="ms between taps of one session")
+    ap.add_argument('--miss', type=float, default=0.05, help="share of taps on a random cell")
+    ap.add_argument('--port', type=int, help="use a running server instead of starting one")
+    ap.add_argument('--results', help="server started here appends wins to this file")
+    args = ap.parse_args()
+    args.gap /= 1000
+    return asyncio.run(run(args))
+
+if __name__ == '__main__':
+    sys.exit(main())
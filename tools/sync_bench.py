@@ -0,0 +1,156 @@
+"""
+THE 77 - Leaderboard sync benchmark
+Queues thousands of results offline, then drains them into a local stand-in server
+
+    python tools/sync_bench.py [--results 5000] [--batch 50] [--fail 0.1]
+                               [--latency 5] [--verify]
+
+Results are played by the replay verifier's scripted player and submitted
+with no endpoint, as on a phone without network; the outbox is then
+reopened from disk, as after a restart, and pointed at a keep-alive HTTP
+server on localhost that answers 503 to a --fail share of requests and
+waits --latency ms per request. With --verify the server re-runs every
+replay like a real leaderboard would. Reports the submit cost on the
+calling thread, upload throughput, retries, connections and duplicates.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from base64 import b64decode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import sync
+from replay import DIFFS, verify
+from storage import WriteBehindStore
+from sync import ScoreSync
+from verify_replays import play
+
+class Leaderboard(ThreadingHTTPServer):
+    """Stand-in endpoint: accepts batches, keeps one result per id"""
+
+    daemon_threads = True
+
+    def __init__(self, fail=0.0, latency=0.0, check=False):
+        super().__init__(('127.0.0.1', 0), Handler)
+        self.fail, self.latency, self.check = fail, latency, check
+        self.lock = threading.Lock()
+        self.results = {}
+        self.stats = {'requests': 0, 'failed': 0, 'duplicates': 0, 'invalid': 0, 'connections': 0}
+        self.rng = random.Random(77)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/scores"
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; do not let Nagle hold the body
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.stats['connections'] += 1
+
+    def do_POST(self):
+        srv = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if srv.latency:
+            time.sleep(srv.latency)
+        with srv.lock:
+            srv.stats['requests'] += 1
+            fail = srv.rng.random() < srv.fail
+            srv.stats['failed'] += fail
+        if fail:
+            return self._reply(503, b'{}')
+        results = json.loads(body)['results']
+        for r in results:
+            if srv.check and not verify(b64decode(r['replay']), r['size'], r['diff'], r['time']):
+                with srv.lock:
+                    srv.stats['invalid'] += 1
+                continue
+            with srv.lock:
+                if r['id'] in srv.results:
+                    srv.stats['duplicates'] += 1
+                srv.results[r['id']] = r
+        self._reply(200, json.dumps({'accepted': len(results)}).encode())
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--results', type=int, default=5000)
+    ap.add_argument('--batch', type=int, default=sync.BATCH)
+    ap.add_argument('--fail', type=float, default=0.0, help="share of requests answered 503")
+    ap.add_argument('--latency', type=float, default=0.0, help="ms per request")
+    ap.add_argument('--verify', action='store_true', help="server re-runs every replay")
+    args = ap.parse_args()
+    # Retry quickly: the stand-in fails on purpose, not because it is down
+    sync.BACKOFF = (0.01, 0.2)
+
+    rng = random.Random(77)
+    games = [(total, diff) + play(total, diff, rng)
+             for total, diff in ((rng.choice((33, 55, 77)), rng.choice(DIFFS))
+                                 for _ in range(args.results))]
+    tmp = tempfile.mkdtemp(prefix='the77sync')
+    path = os.path.join(tmp, 'outbox.jsonl')
+    store = WriteBehindStore(os.path.join(tmp, 'data.json'))
+    outbox = ScoreSync(path, store, batch=args.batch)
+    t = time.perf_counter()
+    for total, diff, blob, secs in games:
+        outbox.submit(total, diff, secs, blob)
+    dt = time.perf_counter() - t
+    again = sum(outbox.submit(total, diff, secs, blob) for total, diff, blob, secs in games[:100])
+    print(f"submitted {args.results} offline in {dt * 1000:.0f} ms "
+          f"({dt / args.results * 1e6:.1f} us each), {again} of 100 resubmits queued")
+    store.flush()
+    print(f"outbox {os.path.getsize(path) / 1024:.0f} KiB on disk")
+
+    # Restart: everything queued must come back from disk
+    store = WriteBehindStore(store.path)
+    outbox = ScoreSync(path, store, batch=args.batch)
+    assert len(outbox) == args.results, (len(outbox), args.results)
+    srv = Leaderboard(args.fail, args.latency / 1000, args.verify)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    t = time.perf_counter()
+    outbox.connect(srv.url)
+    while len(outbox):
+        time.sleep(0.005)
+    dt = time.perf_counter() - t
+    outbox.stop()
+    srv.shutdown()
+    store.flush()
+    s, c = outbox.stats, srv.stats
+    print(f"uploaded {s['sent']} in {dt * 1000:.0f} ms ({s['sent'] / dt:.0f}/s), "
+          f"{s['batches']} batches over {c['connections']} connections, "
+          f"{s['retries']} retries ({c['failed']} failed requests), "
+          f"{c['duplicates']} duplicates, {c['invalid']} invalid")
+    ok = len(srv.results) == args.results and not c['invalid']
+
+    # A third start finds everything sent and empties the log
+    store = WriteBehindStore(store.path)
+    outbox = ScoreSync(path, store)
+    ok = ok and not len(outbox) and os.path.getsize(path) == 0
+    print(f"server holds {len(srv.results)} of {args.results}; outbox "
+          f"{'compacted' if ok else 'NOT drained'}")
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+THE 77 - Replay verifier
+Checks that stored best times are backed by replays that solve the board
+
+    python tools/verify_replays.py [the77data.json] [--synthetic N]
+
+Every ``<size>_<difficulty>`` record with a replay is re-run through the
+rules and reported as ok, FAIL or missing. With --synthetic N, N games
+are played by a scripted player that makes mistakes, recorded, and then
+verified in bulk to report replay size and verification throughput.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from base64 import b64decode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine import GameEngine, WRONG, HOLD
+from replay import DIFFS, Recorder, verify
+
+def check_file(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    bad = 0
+    for key, rec in sorted(data.items()):
+        total, _, diff = key.partition('_')
+        if not total.isdigit() or diff not in DIFFS:
+            continue
+        if 'replay' not in rec:
+            print(f"{key:<14} {rec['v']:>5}s  missing")
+            continue
+        blob = b64decode(rec['replay'])
+        ok = verify(blob, int(total), diff, rec['v'])
+        bad += not ok
+        print(f"{key:<14} {rec['v']:>5}s  {'ok' if ok else 'FAIL'}  {len(blob)} bytes")
+    return bad
+
+def play(total, diff, rng, miss=0.05):
+    """Record one scripted game with a wrong tap every so often"""
+    e = GameEngine(total, diff, rng.getrandbits(32))
+    rec = Recorder()
+    rec.start(e)
+    pos = {n: i for i, n in enumerate(e.nums)}
+    t = 0.0
+    while not e.won:
+        t += rng.uniform(0.25, 1.5)
+        idx = rng.randrange(total) if rng.random() < miss else pos[e.next_num]
+        diff_ = e.tap(idx)
+        if not diff_:
+            continue
+        rec.tap(idx, t)
+        if diff_[-1][1] == WRONG:
+            t += HOLD
+            e.feedback(idx)
+    return rec.blob(), int(t)
+
+def synthetic(n, seed=77):
+    rng = random.Random(seed)
+    games = [(total, diff) + play(total, diff, rng)
+             for total, diff in ((rng.choice((33, 55, 77)), rng.choice(DIFFS))
+                                 for _ in range(n))]
+    size = sum(len(g[2]) for g in games)
+    t = time.perf_counter()
+    ok = sum(verify(blob, total, diff, s) for total, diff, blob, s in games)
+    dt = time.perf_counter() - t
+    played = sum(s for *_, s in games)
+    print(f"{n} replays, {size / n:.0f} bytes avg, {ok} verified in {dt * 1000:.0f} ms "
+          f"({n / dt:.0f}/s, {played / dt:.0f}x real time)")
+    return n - ok
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('path', nargs='?', default='the77data.json')
+    ap.add_argument('--synthetic', type=int, metavar='N')
+    args = ap.parse_args()
+    if args.synthetic:
+        return 1 if synthetic(args.synthetic) else 0
+    return 1 if check_file(args.path) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
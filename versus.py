@@ -0,0 +1,296 @@
+"""
+THE 77 - Versus screen
+Two players race on copies of one board, side by side
+"""
+
+import random
+import time as pytime
+from kivy.app import App
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.floatlayout import FloatLayout
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.graphics import Color, Rectangle
+from kivy.core.window import Window
+from kivy.clock import Clock
+from kivy.metrics import dp, sp
+from engine import GameEngine, CLOSED, OPEN, SOLVED, WRONG
+from board import GridBoard
+from game import FeedbackScheduler, MARGIN
+import layout
+from common import C, T, ThemedScreen, fmt_time
+from screens import VERSUS_MAX
+
+# ============== PLAYER ==============
+class Player:
+    """One side of a versus game.
+
+    Owns a GridBoard, its engine and its own FeedbackScheduler, per-frame
+    flush and clock, so each side gets its own resets, input holds and
+    time. Every touch on a board maps straight to a cell index, so both
+    players can tap at the same time without the sides meeting.
+    """
+
+    def __init__(self, screen, num):
+        self.screen = screen
+        self.num = num
+        self.engine = None
+        self.finish = None
+        self.start_t = 0
+        self.stopped_t = None
+        self.shown_s = -1
+        self.pending = {}
+        self.flush_trigger = Clock.create_trigger(self._flush)
+        self.board = GridBoard()
+        self.board.bind(on_cell=lambda b, idx: self.tap(idx))
+        self.feedback = FeedbackScheduler(lambda idx: self._apply(self.engine.feedback(idx)),
+                                          self.tap)
+        self.layout_trigger = Clock.create_trigger(self._layout)
+        self.shape = None
+
+    def build(self):
+        s = self.screen
+        panel = BoxLayout(orientation='vertical')
+        info = BoxLayout(size_hint_y=None, height=dp(30), padding=[dp(10), 0])
+        self.next_lbl = s.paint(Label(font_size=sp(15), bold=True), color='solved')
+        info.add_widget(self.next_lbl)
+        self.time_lbl = s.paint(Label(font_size=sp(14)), color='t1')
+        info.add_widget(self.time_lbl)
+        panel.add_widget(info)
+        self.container = FloatLayout()
+        self.container.add_widget(self.board)
+        self.container.bind(size=self.layout_trigger, pos=self.layout_trigger)
+        panel.add_widget(self.container)
+        return panel
+
+    def start(self, total, diff, seed):
+        self.feedback.cancel()
+        self.pending.clear()
+        self.finish = None
+        self.engine = GameEngine(total, diff, seed)
+        self.board.show(self.engine.nums)
+        self.shape = None
+        self.layout_trigger()
+        self.show_next()
+        self.start_t = pytime.monotonic()
+        self.stopped_t = None
+        self.shown_s = -1
+
+    def stop(self):
+        self.feedback.cancel()
+        self.flush_trigger.cancel()
+        self.stop_clock()
+
+    def suspend(self):
+        """Settle pending resets, draw them and stop the clock"""
+        if self.engine is None:
+            return
+        while self.feedback.due >= 0:
+            self.feedback.fire()
+        self.feedback.cancel()
+        self.flush_trigger.cancel()
+        self._flush()
+        self.stop_clock()
+
+    def elapsed(self):
+        return (self.stopped_t or pytime.monotonic()) - self.start_t
+
+    def stop_clock(self):
+        if self.stopped_t is None:
+            self.stopped_t = pytime.monotonic()
+
+    def start_clock(self):
+        """Carry on after ``stop_clock``, leaving out the stopped time"""
+        if self.stopped_t is not None:
+            self.start_t += pytime.monotonic() - self.stopped_t
+            self.stopped_t = None
+
+    def show_time(self, s):
+        self.time_lbl.text = f"{T('time')} {fmt_time(int(s))}"
+
+    def tap(self, idx):
+        s = self.screen
+        if s.over or self.finish is not None or self.feedback.hold(idx):
+            return
+        diff = self.engine.tap(idx)
+        if not diff:
+            return
+        self._apply(diff)
+        if diff[-1][1] == WRONG:
+            self.feedback.schedule(idx, self.engine.diff != 'easy')
+        elif self.engine.won:
+            self.stop_clock()
+            self.finish = self.elapsed()
+            s.finished(self)
+
+    def _apply(self, diff):
+        for idx, state in diff:
+            self.pending[idx] = state
+        self.flush_trigger()
+
+    def _flush(self, dt=None):
+        for idx, state in self.pending.items():
+            self.board.set_cell(idx, state)
+        self.pending.clear()
+        self.show_next()
+
+    def show_next(self):
+        self.next_lbl.text = f"{self.num}P  {T('next')} {min(self.engine.next_num, self.engine.total)}"
+
+    def _layout(self, *args):
+        c = self.container
+        if c.width <= 1 or c.height <= 1 or not self.board.n:
+            return
+        shape = layout.solve(self.board.n, c.width, c.height, dp(2), MARGIN + dp(6))
+        if shape != self.shape:
+            self.shape = shape
+            rows, cols, cell_w, cell_h = shape
+            self.board.reshape(rows, cols)
+            self.board.resize(cell_w, cell_h)
+        w, h = self.board.size
+        self.board.pos = (c.x + (c.width - w) / 2, c.y + (c.height - h) / 2)
+
+# ============== VERSUS ==============
+class VersusScreen(ThemedScreen):
+    """Split-screen race: the same permutation, rules and start time for
+    both players, side by side in landscape and stacked in portrait.
+    The first to solve their board wins. Each player's time is their own
+    clock, stopped when they finish and while the app is suspended."""
+
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.players = (Player(self, 1), Player(self, 2))
+        self.total = 0
+        self.over = False
+        self.timer = None
+
+    def build(self):
+        root = BoxLayout(orientation='vertical')
+        with root.canvas.before:
+            self.paint(Color(), rgba='bg')
+            self.bgr = Rectangle(size=Window.size)
+        root.bind(size=lambda w, s: setattr(self.bgr, 'size', s))
+
+        top = BoxLayout(size_hint_y=None, height=dp(44), padding=dp(5), spacing=dp(5))
+        with top.canvas.before:
+            self.paint(Color(), rgba='bg2')
+            self.topr = Rectangle()
+        top.bind(size=lambda w, s: setattr(self.topr, 'size', s),
+                 pos=lambda w, p: setattr(self.topr, 'pos', p))
+        bb = Button(font_size=sp(14), bold=True, background_normal='', size_hint_x=0.15)
+        self.say(self.paint(bb, background_color='b2', color='tw'), lambda: T('back'))
+        bb.bind(on_release=lambda x: App.get_running_app().goto('diff'))
+        top.add_widget(bb)
+        top.add_widget(self.say(self.paint(Label(font_size=sp(20), bold=True), color='t1'),
+                                lambda: f"THE {self.total}  {T('versus')}"))
+        nb = Button(font_size=sp(13), background_normal='', size_hint_x=0.18)
+        self.say(self.paint(nb, background_color='bok', color='tw'), lambda: T('newgame'))
+        nb.bind(on_release=lambda x: self.new_game())
+        top.add_widget(nb)
+        root.add_widget(top)
+
+        self.body = BoxLayout(spacing=dp(6))
+        for p in self.players:
+            self.body.add_widget(p.build())
+        self.body.bind(size=self._orient)
+        root.add_widget(self.body)
+        self.add_widget(root)
+
+        self.overlay = FloatLayout()
+        with self.overlay.canvas:
+            self.ov_color = Color()
+            self.ov_bg = Rectangle(size=Window.size)
+        self.overlay.bind(size=lambda w, s: setattr(self.ov_bg, 'size', s))
+        self.win_lbl = self.paint(
+            Label(font_size=sp(32), bold=True, pos_hint={'center_x': 0.5, 'center_y': 0.55}),
+            color='correct')
+        self.overlay.add_widget(self.win_lbl)
+        self.final_lbl = self.paint(
+            Label(font_size=sp(20), pos_hint={'center_x': 0.5, 'center_y': 0.45}), color='t1')
+        self.overlay.add_widget(self.final_lbl)
+        again = Button(font_size=sp(16), background_normal='', size_hint=(0.3, 0.07),
+                       pos_hint={'center_x': 0.5, 'center_y': 0.32})
+        self.say(self.paint(again, background_color='bok', color='tw'), lambda: T('newgame'))
+        again.bind(on_release=lambda x: self.new_game())
+        self.overlay.add_widget(again)
+
+    def on_theme(self):
+        colors = {CLOSED: C('cell'), OPEN: C('correct'), SOLVED: C('solved'), WRONG: C('wrong')}
+        for p in self.players:
+            p.board.set_colors(C('grid'), C('tw'), colors)
+
+    def _orient(self, body, size):
+        body.orientation = 'horizontal' if size[0] > size[1] else 'vertical'
+
+    def on_pre_enter(self):
+        self.total = min(App.get_running_app().gtotal, VERSUS_MAX)
+        super().on_pre_enter()
+
+    def on_enter(self):
+        Clock.schedule_once(lambda dt: self.new_game(), 0.1)
+
+    def on_leave(self):
+        self._stop_timer()
+        for p in self.players:
+            p.stop()
+
+    def power_state(self):
+        return 'idle' if self.over else 'active'
+
+    def new_game(self):
+        diff = App.get_running_app().gdiff
+        seed = random.getrandbits(32)
+        self.over = False
+        if self.overlay.parent:
+            self.remove_widget(self.overlay)
+        for p in self.players:
+            p.start(self.total, diff, seed)
+        self._stop_timer()
+        self._tick(0)
+
+    def suspend(self):
+        """Stop every Clock event and both clocks, e.g. on app pause"""
+        self._stop_timer()
+        for p in self.players:
+            p.suspend()
+
+    def resume(self):
+        """Restart the clocks stopped by ``suspend``"""
+        if self.over or self.timer or self.players[0].engine is None:
+            return
+        for p in self.players:
+            p.start_clock()
+        self._tick(0)
+
+    def finished(self, player):
+        """``player`` solved their board: the race is over"""
+        self.over = True
+        self._stop_timer()
+        for p in self.players:
+            p.feedback.cancel()
+            p.stop_clock()
+        player.show_time(player.finish)
+        self.ov_color.rgba = (*C('bg')[:3], 0.9)
+        self.win_lbl.text = f"{player.num}P {T('wins')}"
+        self.final_lbl.text = f"{T('time')} {fmt_time(int(player.finish))}"
+        self.add_widget(self.overlay)
+
+    def _stop_timer(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+
+    def _tick(self, dt):
+        """Show each player's seconds, then sleep to the next second boundary"""
+        self.timer = None
+        if self.over:
+            return
+        wait = 1
+        for p in self.players:
+            e = p.elapsed()
+            s = int(e)
+            if s != p.shown_s:
+                p.shown_s = s
+                p.show_time(s)
+            wait = min(wait, s + 1 - e)
+        self.timer = Clock.schedule_once(self._tick, wait)